@@ -1,11 +1,16 @@
 import streamlit as st
-import google.generativeai as genai
-import json
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime
-import pandas as pd
-import time
+import streamlit.components.v1 as components
+import os
+import uuid
+
+from mindcart import metrics
+from mindcart.analysis import Analyzer, load_catalog, load_rule_engine
+from mindcart.cart import Cart
+from mindcart.catalog import CATEGORIES
+from mindcart.charts import FigureCache, category_pie, savings_line
+from mindcart.client import AnalysisClient
+from mindcart.history import open_history_store
+from mindcart.prefetch import Prefetcher
 
 # Configure Streamlit page
 st.set_page_config(
@@ -112,215 +117,130 @@ st.markdown("""
 # Initialize session state
 def init_session_state():
     if 'cart' not in st.session_state:
-        st.session_state.cart = []
+        st.session_state.cart = Cart()
     if 'current_page' not in st.session_state:
         st.session_state.current_page = 'landing'
     if 'analysis_result' not in st.session_state:
         st.session_state.analysis_result = None
-    if 'session_history' not in st.session_state:
-        st.session_state.session_history = []
+    if 'analysis_pending' not in st.session_state:
+        st.session_state.analysis_pending = False
+    if 'history_page' not in st.session_state:
+        st.session_state.history_page = 0
     if 'shopping_goal' not in st.session_state:
         st.session_state.shopping_goal = None
     if 'justified_items' not in st.session_state:
         st.session_state.justified_items = {}
     if 'show_justification' not in st.session_state:
         st.session_state.show_justification = {}
+    if 'catalog_page' not in st.session_state:
+        st.session_state.catalog_page = 0
+    if 'catalog_query' not in st.session_state:
+        st.session_state.catalog_query = None
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
 
 init_session_state()
 
-# Configure Gemini API (uncomment and add your API key)
-genai.configure(api_key="Your api key here")
-
-# Sample products database
-PRODUCTS = {
-    "🥛 Milk": {"category": "Essential", "price": 60, "emoji": "🥛"},
-    "🍫 Chocolate Cake": {"category": "Treat", "price": 350, "emoji": "🍫"},
-    "⌚ Smartwatch": {"category": "Luxury", "price": 15000, "emoji": "⌚"},
-    "🍎 Apples": {"category": "Essential", "price": 120, "emoji": "🍎"},
-    "🍕 Pizza": {"category": "Treat", "price": 450, "emoji": "🍕"},
-    "👕 T-Shirt": {"category": "Essential", "price": 800, "emoji": "👕"},
-    "🎮 Gaming Console": {"category": "Luxury", "price": 50000, "emoji": "🎮"},
-    "🧴 Shampoo": {"category": "Essential", "price": 250, "emoji": "🧴"},
-    "🍿 Popcorn": {"category": "Treat", "price": 100, "emoji": "🍿"},
-    "📱 Phone Case": {"category": "Impulse", "price": 500, "emoji": "📱"},
-    "🧸 Teddy Bear": {"category": "Impulse", "price": 1200, "emoji": "🧸"},
-    "☕ Coffee": {"category": "Essential", "price": 150, "emoji": "☕"},
-    "💄 Lipstick": {"category": "Impulse", "price": 800, "emoji": "💄"},
-    "🏃‍♀️ Running Shoes": {"category": "Essential", "price": 3500, "emoji": "🏃‍♀️"},
-    "🍰 Cupcakes": {"category": "Treat", "price": 200, "emoji": "🍰"}
-}
-
-def analyze_cart_with_gemini(cart_items, shopping_goal=None):
-    """Analyze cart using Gemini API"""
+@st.cache_resource
+def get_history_store():
+    """Shopping history shared by every session; MINDCART_HISTORY_DB=memory keeps it in-process"""
+    return open_history_store(os.environ.get("MINDCART_HISTORY_DB", "mindcart_history.db"))
+
+def current_user_id():
+    """Anonymous shopper id, kept in the URL so history survives reloads"""
+    if "user" not in st.query_params:
+        st.query_params["user"] = uuid.uuid4().hex
+    return st.query_params["user"]
+
+def gemini_api_key():
+    """GEMINI_API_KEY from the environment or .streamlit/secrets.toml"""
+    if os.environ.get("GEMINI_API_KEY"):
+        return os.environ["GEMINI_API_KEY"]
     try:
-        # Initialize the model
-        model = genai.GenerativeModel("gemini-1.5-flash")
-
-        # Create prompt for Gemini
-        cart_details = []
-        for item in cart_items:
-            product = PRODUCTS[item["name"]]
-            cart_details.append({
-                "name": item["name"],
-                "price": product["price"],
-                "category": product["category"],
-                "reason": item.get("reason", "No reason provided")
-            })
-
-        prompt = f"""
-        You are a shopping psychology expert analyzing a customer's cart.
-        Shopping Goal: {shopping_goal or "General Shopping"}
-
-        Cart Items:
-        {json.dumps(cart_details, indent=2)}
-
-        For each item, provide:
-        1. A verdict: "✅ Keep", "⚠️ Reconsider", or "🤔 Optional"
-        2. A personalized suggestion based on behavioral psychology
-        3. Consider the shopping goal and item necessity
-
-        Also provide:
-        - Shopping identity badge (e.g., "Mindful Shopper", "Impulse Buyer", "Balanced Shopper")
-        - Personality breakdown (mindful %, indulgent %, emotional %)
-        - Estimated savings if flagged items are removed
-        - **Reward Recommendation**: If the customer removes impulse or luxury items, suggest a positive reinforcement message that includes:
-        - A sense of achievement (e.g., "Great job cutting down!")
-        - A small, affordable treat suggestion (e.g., "Would you like to treat yourself with a healthy snack instead?")
-        - Ensure that this reward keeps the overall cart value reasonable without promoting overspending.
-
-        Return response in this exact JSON format:
-        {{
-            "items": [
-                {{
-                    "name": "item_name",
-                    "verdict": "verdict",
-                    "suggestion": "detailed_suggestion"
-                }}
-            ],
-            "summary": {{
-                "identity_badge": "badge_name",
-                "estimated_savings": savings_amount
-                "reward_recommendation": "reward_text"
-            }},
-            "personality": {{
-                "mindful": percentage,
-                "indulgent": percentage,
-                "emotional": percentage
-            }}
-        }}
-        """
-
-        # Call Gemini API
-        response = model.generate_content(prompt)
-
-        # Parse the response
-        try:
-            # Extract JSON from response
-            response_text = response.text
-            if "```json" in response_text:
-                json_start = response_text.find("```json") + 7
-                json_end = response_text.find("```", json_start)
-                response_text = response_text[json_start:json_end]
-
-            gemini_analysis = json.loads(response_text)
-
-            # Build final analysis structure
-            analysis = {
-                "items": [],
-                "summary": {
-                    "total_items": len(cart_items),
-                    "flagged_items": 0,
-                    "estimated_savings": gemini_analysis["summary"]["estimated_savings"],
-                    "identity_badge": gemini_analysis["summary"]["identity_badge"]
-                },
-                "categories": {"Essential": 0, "Treat": 0, "Luxury": 0, "Impulse": 0},
-                "personality": gemini_analysis["personality"]
-            }
-
-            # Process each item
-            for i, item in enumerate(cart_items):
-                product = PRODUCTS[item["name"]]
-                category = product["category"]
-                analysis["categories"][category] += 1
-
-                # Get Gemini analysis for this item
-                gemini_item = gemini_analysis["items"][i] if i < len(gemini_analysis["items"]) else {}
-
-                verdict = gemini_item.get("verdict", "🤔 Optional")
-                suggestion = gemini_item.get("suggestion", "Consider if this purchase aligns with your goals.")
-
-                if "Reconsider" in verdict:
-                    analysis["summary"]["flagged_items"] += 1
-
-                analysis["items"].append({
-                    "name": item["name"],
-                    "emoji": product["emoji"],
-                    "verdict": verdict,
-                    "suggestion": suggestion,
-                    "price": product["price"],
-                    "reason": item.get("reason", "")
-                })
-
-            return analysis
-
-        except (json.JSONDecodeError, KeyError) as e:
-            st.error(f"Error parsing Gemini response: {e}")
-            return create_fallback_analysis(cart_items)
-
-    except Exception as e:
-        st.warning(f"Using fallback analysis (Gemini API not configured): {e}")
-        return create_fallback_analysis(cart_items)
-
-def create_fallback_analysis(cart_items):
-    """Fallback analysis if Gemini API fails"""
-    analysis = {
-        "items": [],
-        "summary": {
-            "total_items": len(cart_items),
-            "flagged_items": 0,
-            "estimated_savings": 0,
-            "identity_badge": "Balanced Shopper"
-        },
-        "categories": {"Essential": 0, "Treat": 0, "Luxury": 0, "Impulse": 0},
-        "personality": {"mindful": 70, "indulgent": 20, "emotional": 10}
-    }
-
-    total_savings = 0
-
-    for item in cart_items:
-        product = PRODUCTS[item["name"]]
-        category = product["category"]
-        analysis["categories"][category] += 1
-
-        # Basic analysis logic
-        if category == "Essential":
-            verdict = "✅ Keep"
-            suggestion = "This is an essential item for your daily needs."
-        elif category == "Treat":
-            verdict = "🤔 Optional"
-            suggestion = "This is a treat - enjoy responsibly if it fits your budget."
-        elif category == "Luxury":
-            verdict = "⚠️ Reconsider"
-            suggestion = "This is a luxury item. Consider if it's truly necessary right now."
-            analysis["summary"]["flagged_items"] += 1
-            total_savings += product["price"] * 0.3
-        else:  # Impulse
-            verdict = "⚠️ Reconsider"
-            suggestion = "This seems like an impulse purchase. Take a moment to think."
-            analysis["summary"]["flagged_items"] += 1
-            total_savings += product["price"]
-
-        analysis["items"].append({
-            "name": item["name"],
-            "emoji": product["emoji"],
-            "verdict": verdict,
-            "suggestion": suggestion,
-            "price": product["price"],
-            "reason": item.get("reason", "")
-        })
-
-    analysis["summary"]["estimated_savings"] = total_savings
-    return analysis
+        return st.secrets.get("GEMINI_API_KEY")
+    except FileNotFoundError:
+        return None
+
+@st.cache_resource
+def get_figure_cache():
+    """Built chart figures shared by every session, keyed by their data"""
+    return FigureCache(
+        max_entries=int(os.environ.get("MINDCART_CHART_CACHE_SIZE", 256)),
+        max_workers=int(os.environ.get("MINDCART_CHART_WORKERS", 2))
+    )
+
+@st.cache_resource
+def get_rule_engine():
+    """Deterministic first stage of the analysis, optionally loaded from MINDCART_RULES_FILE"""
+    return load_rule_engine()
+
+@st.cache_resource
+def get_catalog():
+    """Product catalog from MINDCART_CATALOG (CSV, Parquet or SQLite), else the sample products"""
+    return load_catalog()
+
+@st.cache_resource
+def get_analyzer():
+    """The analysis service at MINDCART_ANALYSIS_URL if set, else an in-process analyzer
+
+    A remote service must be configured with the same catalog as the app.
+    """
+    url = os.environ.get("MINDCART_ANALYSIS_URL")
+    if url:
+        return AnalysisClient(url, get_catalog(), get_rule_engine())
+    return Analyzer.from_env(get_catalog(), get_rule_engine(), api_key=gemini_api_key())
+
+@st.cache_resource
+def get_prefetcher():
+    """Analyzes carts left unchanged for MINDCART_PREFETCH_IDLE_MS (0 disables)"""
+    idle_ms = float(os.environ.get("MINDCART_PREFETCH_IDLE_MS", 1500))
+    if idle_ms <= 0:
+        return None
+    return Prefetcher(
+        get_analyzer(),
+        idle_seconds=idle_ms / 1000,
+        max_workers=int(os.environ.get("MINDCART_PREFETCH_WORKERS", 4))
+    )
+
+def analysis_events(cart_items, shopping_goal):
+    """Events of the speculative analysis of this cart if there is one, else a fresh stream"""
+    prefetcher = get_prefetcher()
+    events = prefetcher and prefetcher.take(st.session_state.session_id, cart_items, shopping_goal)
+    if events is not None:
+        for event in events:
+            yield event
+            if event[0] == "done":
+                return
+    yield from get_analyzer().stream(cart_items, shopping_goal)
+
+@st.cache_resource
+def start_metrics_endpoint():
+    """Prometheus metrics on 127.0.0.1:MINDCART_METRICS_PORT, once per server process"""
+    metrics.configure_logging()
+    port = os.environ.get("MINDCART_METRICS_PORT")
+    return metrics.serve(int(port)) if port else None
+
+REFLECTION_COUNTDOWN_HTML = """
+<div id="reflection" style="text-align: center; font-size: 2rem; padding: 2rem; font-family: sans-serif; color: #333333;"></div>
+<script>
+    const box = document.getElementById("reflection");
+    let remaining = 10;
+    const tick = () => {
+        if (remaining > 0) {
+            box.textContent = `Think about your purchases... ${remaining}`;
+            remaining -= 1;
+            setTimeout(tick, 1000);
+        } else {
+            box.style.fontSize = "1.5rem";
+            box.style.color = "#10b981";
+            box.textContent = "✨ Reflection complete! You're ready to decide.";
+        }
+    };
+    tick();
+</script>
+"""
+
+FREQUENT_SKUS = ["ESS-MILK", "ESS-COFFEE", "ESS-APPLES", "ESS-SHAMPOO"]
 
 def landing_page():
     """Landing page with welcome message and CTA"""
@@ -378,6 +298,174 @@ def landing_page():
         </div>
         """, unsafe_allow_html=True)
 
+PAGE_SIZES = [12, 24, 48]
+
+def change_catalog_page(step):
+    st.session_state.catalog_page += step
+
+@st.fragment
+def product_grid():
+    """Search controls and the current page of the product catalog
+
+    Searching and paging only rerun this fragment; adding to the cart reruns
+    the whole page so the cart panel picks up the new item.
+    """
+    catalog = get_catalog()
+
+    # Search/filter functionality
+    search_col, category_col, size_col = st.columns([3, 2, 1])
+    with search_col:
+        search_term = st.text_input("🔍 Search products...", placeholder="Type to search...")
+    with category_col:
+        categories = st.multiselect("Category", CATEGORIES, key="catalog_categories",
+                                    placeholder="All categories")
+    with size_col:
+        page_size = st.selectbox("Per page", PAGE_SIZES, key="catalog_page_size")
+
+    # Start from the first page whenever the search changes
+    query = (search_term, tuple(categories), page_size)
+    if st.session_state.catalog_query != query:
+        st.session_state.catalog_query = query
+        st.session_state.catalog_page = 0
+
+    # Only the visible page of products is fetched and rendered
+    results = catalog.query(search_term, categories=categories or None,
+                            page=st.session_state.catalog_page, page_size=page_size)
+    st.session_state.catalog_page = results.page
+    page_products = results.items
+
+    if not page_products:
+        st.info("No products match your search.")
+
+    # Display products in a grid
+    products_per_row = 3
+
+    for i in range(0, len(page_products), products_per_row):
+        cols = st.columns(products_per_row)
+        for j, col in enumerate(cols):
+            if i + j < len(page_products):
+                product = page_products[i + j]
+
+                with col:
+                    st.markdown(f"""
+                    <div class="product-card">
+                        <div style="text-align: center; font-size: 2rem;">{product.emoji}</div>
+                        <h4>{product.name}</h4>
+                        <p style="color: #6b7280;">{product.category}</p>
+                        <p style="font-weight: 600; color: #10b981;">₹{product.price}</p>
+                    </div>
+                    """, unsafe_allow_html=True)
+
+                    if st.button(f"➕ Add to Cart", key=f"add_{product.sku}"):
+                        add_to_cart(product)
+                        st.success(f"Added {product.name} to cart!")
+                        st.rerun()
+
+    # Pagination controls
+    if results.page_count > 1:
+        prev_col, info_col, next_col = st.columns([1, 2, 1])
+        with prev_col:
+            st.button("◀ Previous", key="catalog_prev", disabled=results.page == 0,
+                      on_click=change_catalog_page, args=(-1,))
+        with info_col:
+            st.markdown(
+                f"<p style='text-align: center; color: #6b7280;'>Page {results.page + 1} of "
+                f"{results.page_count} · {results.total} products</p>",
+                unsafe_allow_html=True
+            )
+        with next_col:
+            st.button("Next ▶", key="catalog_next", disabled=results.page >= results.page_count - 1,
+                      on_click=change_catalog_page, args=(1,))
+
+def cart_changed():
+    """Restart the idle countdown for speculatively analyzing the cart"""
+    prefetcher = get_prefetcher()
+    if prefetcher:
+        prefetcher.schedule(st.session_state.session_id, st.session_state.cart.to_items(),
+                            st.session_state.shopping_goal)
+
+def add_to_cart(product, reason=""):
+    st.session_state.cart.add(product, reason=reason)
+    # Drop stale widget state so the cart panel shows the new quantity and reason
+    st.session_state.pop(f"quantity_{product.sku}", None)
+    st.session_state.pop(f"reason_{product.sku}", None)
+    cart_changed()
+
+def remove_from_cart(sku):
+    st.session_state.cart.remove(sku)
+    cart_changed()
+
+def update_quantity(sku):
+    st.session_state.cart.set_quantity(sku, st.session_state[f"quantity_{sku}"])
+    cart_changed()
+
+def update_reason(sku):
+    st.session_state.cart.set_reason(sku, st.session_state[f"reason_{sku}"])
+    cart_changed()
+
+@st.fragment
+def cart_panel():
+    """Cart contents, reasons and totals; edits here only rerun this panel"""
+    st.markdown("### 🛒 Your Cart")
+
+    cart = st.session_state.cart
+    if cart:
+        # Widget keys follow the SKU, so removing a line doesn't shift the others
+        for item in cart:
+            st.markdown(f"""
+            <div class="cart-item">
+                <strong>{item.name}</strong><br>
+                ₹{item.price} × {item.quantity}
+            </div>
+            """, unsafe_allow_html=True)
+
+            st.number_input("Quantity", min_value=0, step=1, value=item.quantity,
+                            key=f"quantity_{item.sku}", on_change=update_quantity, args=(item.sku,))
+
+            # Optional reason input
+            st.text_input(
+                f"Why are you buying this?",
+                value=item.reason,
+                key=f"reason_{item.sku}",
+                placeholder="Optional reason...",
+                on_change=update_reason,
+                args=(item.sku,)
+            )
+
+            st.button(f"🗑️ Remove", key=f"remove_{item.sku}", on_click=remove_from_cart, args=(item.sku,))
+
+        total_price = cart.total
+        st.markdown(f"""
+        <div class="metric-card">
+            <h3>Total: ₹{total_price}</h3>
+            <p>{cart.item_count} items</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+        # Smart upsell banners
+        if total_price < 500:
+            st.markdown("""
+            <div style="background: #fef3c7; padding: 1rem; border-radius: 10px; margin: 1rem 0;">
+                🛍️ Add ₹{} more to unlock free shipping!
+            </div>
+            """.format(500 - total_price), unsafe_allow_html=True)
+
+        if total_price >= 800:
+            st.markdown("""
+            <div style="background: #d1fae5; padding: 1rem; border-radius: 10px; margin: 1rem 0;">
+                🎁 Great! You qualify for a surprise gift!
+            </div>
+            """, unsafe_allow_html=True)
+
+        if st.button("🧠 Analyze My Cart", key="analyze_cart"):
+            # The analysis page streams verdicts in as they arrive
+            st.session_state.analysis_result = None
+            st.session_state.analysis_pending = True
+            st.session_state.current_page = 'analysis'
+            st.rerun()
+    else:
+        st.info("Your cart is empty. Add some products to get started!")
+
 def cart_builder_page():
     """Cart builder with product selection and cart management"""
     st.markdown("""
@@ -392,140 +480,150 @@ def cart_builder_page():
     with col1:
         st.markdown("### 🛍️ Available Products")
 
-        # Search/filter functionality
-        search_term = st.text_input("🔍 Search products...", placeholder="Type to search...")
-
-        # Filter products based on search
-        filtered_products = PRODUCTS
-        if search_term:
-            filtered_products = {k: v for k, v in PRODUCTS.items()
-                               if search_term.lower() in k.lower()}
-
-        # Display products in a grid
-        products_per_row = 3
-        product_keys = list(filtered_products.keys())
-
-        for i in range(0, len(product_keys), products_per_row):
-            cols = st.columns(products_per_row)
-            for j, col in enumerate(cols):
-                if i + j < len(product_keys):
-                    product_name = product_keys[i + j]
-                    product_info = filtered_products[product_name]
-
-                    with col:
-                        st.markdown(f"""
-                        <div class="product-card">
-                            <div style="text-align: center; font-size: 2rem;">{product_info['emoji']}</div>
-                            <h4>{product_name}</h4>
-                            <p style="color: #6b7280;">{product_info['category']}</p>
-                            <p style="font-weight: 600; color: #10b981;">₹{product_info['price']}</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-
-                        if st.button(f"➕ Add to Cart", key=f"add_{product_name}"):
-                            st.session_state.cart.append({
-                                "name": product_name,
-                                "price": product_info['price'],
-                                "reason": ""
-                            })
-                            st.success(f"Added {product_name} to cart!")
-                            st.rerun()
+        product_grid()
+        catalog = get_catalog()
 
         # Frequently bought items
         st.markdown("---")
         st.markdown("### 🔄 Frequently Bought by You")
-        frequent_items = ["🥛 Milk", "☕ Coffee", "🍎 Apples", "🧴 Shampoo"]
+        frequent_items = [catalog[sku] for sku in FREQUENT_SKUS if sku in catalog]
 
-        cols = st.columns(len(frequent_items))
-        for i, item in enumerate(frequent_items):
+        cols = st.columns(max(len(frequent_items), 1))
+        for i, product in enumerate(frequent_items):
             with cols[i]:
-                if st.button(f"Quick Add {PRODUCTS[item]['emoji']}", key=f"quick_{item}"):
-                    st.session_state.cart.append({
-                        "name": item,
-                        "price": PRODUCTS[item]['price'],
-                        "reason": "Frequently bought"
-                    })
-                    st.success(f"Added {item} to cart!")
+                if st.button(f"Quick Add {product.emoji}", key=f"quick_{product.sku}"):
+                    add_to_cart(product, reason="Frequently bought")
+                    st.success(f"Added {product.name} to cart!")
                     st.rerun()
 
     with col2:
-        st.markdown("### 🛒 Your Cart")
-
-        if st.session_state.cart:
-            total_price = 0
-            for i, item in enumerate(st.session_state.cart):
-                total_price += item['price']
-
-                st.markdown(f"""
-                <div class="cart-item">
-                    <strong>{item['name']}</strong><br>
-                    ₹{item['price']}
-                </div>
-                """, unsafe_allow_html=True)
-
-                # Optional reason input
-                reason = st.text_input(
-                    f"Why are you buying this?",
-                    value=item.get('reason', ''),
-                    key=f"reason_{i}",
-                    placeholder="Optional reason..."
-                )
-                st.session_state.cart[i]['reason'] = reason
-
-                if st.button(f"🗑️ Remove", key=f"remove_{i}"):
-                    st.session_state.cart.pop(i)
-                    st.rerun()
-
-            st.markdown(f"""
-            <div class="metric-card">
-                <h3>Total: ₹{total_price}</h3>
-                <p>{len(st.session_state.cart)} items</p>
-            </div>
-            """, unsafe_allow_html=True)
-
-            # Smart upsell banners
-            if total_price < 500:
-                st.markdown("""
-                <div style="background: #fef3c7; padding: 1rem; border-radius: 10px; margin: 1rem 0;">
-                    🛍️ Add ₹{} more to unlock free shipping!
-                </div>
-                """.format(500 - total_price), unsafe_allow_html=True)
-
-            if total_price >= 800:
-                st.markdown("""
-                <div style="background: #d1fae5; padding: 1rem; border-radius: 10px; margin: 1rem 0;">
-                    🎁 Great! You qualify for a surprise gift!
-                </div>
-                """, unsafe_allow_html=True)
-
-            if st.button("🧠 Analyze My Cart", key="analyze_cart"):
-                with st.spinner("Analyzing your cart with AI..."):
-                    time.sleep(2)  # Simulate API call
-                    st.session_state.analysis_result = analyze_cart_with_gemini(st.session_state.cart, st.session_state.shopping_goal)
-                    st.session_state.current_page = 'analysis'
-                    st.rerun()
-        else:
-            st.info("Your cart is empty. Add some products to get started!")
+        cart_panel()
 
     # Navigation
     if st.button("← Back to Home"):
         st.session_state.current_page = 'landing'
         st.rerun()
 
+def render_analysis_header():
+    st.markdown("""
+    <div class="main-header">
+        <h1>📊 Your Cart Analysis</h1>
+        <p style="color: #6b7280;">AI-powered insights for smarter shopping</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+def render_item_card(item, verdict_class):
+    st.markdown(f"""
+    <div class="analysis-card {verdict_class}">
+        <h4>{item['emoji']} {item['name']} - ₹{item['price']}{f" × {item['quantity']}" if item.get('quantity', 1) > 1 else ""}</h4>
+        <p><strong>{item['verdict']}</strong></p>
+        <p>{item['suggestion']}</p>
+        {f"<p><em>Your reason: {item['reason']}</em></p>" if item['reason'] else ""}
+    </div>
+    """, unsafe_allow_html=True)
+
+def verdict_css_class(verdict):
+    return "keep-item" if "Keep" in verdict else \
+           "reconsider-item" if "Reconsider" in verdict else "optional-item"
+
+# Widget callbacks run before the fragment reruns, so no extra st.rerun() is needed
+def set_justification_form(item_name, visible):
+    st.session_state.show_justification[item_name] = visible
+
+def submit_justification(item_name):
+    justification = st.session_state.get(f"justification_text_{item_name}", "")
+    if justification.strip():
+        st.session_state.justified_items[item_name] = justification
+        st.session_state.show_justification[item_name] = False
+    else:
+        st.session_state[f"justification_error_{item_name}"] = True
+
+def remove_justification(item_name):
+    st.session_state.justified_items.pop(item_name, None)
+
+@st.fragment
+def item_review(item):
+    """Verdict card and justification controls; only this card reruns on interaction"""
+    item_name = item['name']
+    verdict_class = verdict_css_class(item["verdict"])
+
+    # Check if item is justified
+    if item_name in st.session_state.justified_items:
+        verdict_class = "justified-item"
+
+    render_item_card(item, verdict_class)
+
+    # Justify item functionality
+    if "Reconsider" in item["verdict"] and item_name not in st.session_state.justified_items:
+        col1, col2 = st.columns([1, 3])
+
+        with col1:
+            st.button(f"💭 Justify", key=f"justify_btn_{item_name}",
+                      on_click=set_justification_form, args=(item_name, True))
+
+        # Show justification form if requested
+        if st.session_state.show_justification.get(item_name, False):
+            with col2:
+                with st.form(key=f"justify_form_{item_name}"):
+                    st.text_area(
+                        f"Why do you need {item['name']}?",
+                        placeholder="Explain your reasoning...",
+                        key=f"justification_text_{item_name}"
+                    )
+
+                    col_a, col_b = st.columns(2)
+                    with col_a:
+                        st.form_submit_button("✅ Justify Purchase",
+                                              on_click=submit_justification, args=(item_name,))
+                    with col_b:
+                        st.form_submit_button("❌ Cancel",
+                                              on_click=set_justification_form, args=(item_name, False))
+
+                if st.session_state.pop(f"justification_error_{item_name}", False):
+                    st.error("Please provide a reason.")
+
+    # Show justified items
+    elif item_name in st.session_state.justified_items:
+        st.success(f"✅ Justified: {st.session_state.justified_items[item_name]}")
+        st.button(f"Remove Justification", key=f"remove_justification_{item_name}",
+                  on_click=remove_justification, args=(item_name,))
+
+def streaming_analysis_page():
+    """Render item verdicts as Gemini streams them, then show the full page"""
+    render_analysis_header()
+    st.markdown("### 🔍 Item Analysis")
+
+    status = st.empty()
+    status.info("🧠 Analyzing your cart with AI...")
+    cards = [st.empty() for _ in st.session_state.cart]
+
+    for event in analysis_events(st.session_state.cart.to_items(), st.session_state.shopping_goal):
+        if event[0] == "item":
+            _, index, item = event
+            with cards[index].container():
+                render_item_card(item, verdict_css_class(item["verdict"]))
+            status.info(f"🧠 Analyzed {index + 1} of {len(cards)} items...")
+        elif event[0] == "warning":
+            st.warning(event[1])
+        else:
+            st.session_state.analysis_result = event[1]
+
+    st.session_state.analysis_pending = False
+    st.rerun()
+
 def analysis_page():
     """Analysis results with AI insights and recommendations"""
+    if st.session_state.analysis_pending and st.session_state.cart:
+        streaming_analysis_page()
+        return
+
     if not st.session_state.analysis_result:
         st.error("No analysis data available. Please build a cart first.")
         return
 
     analysis = st.session_state.analysis_result
 
-    st.markdown("""
-    <div class="main-header">
-        <h1>📊 Your Cart Analysis</h1>
-        <p style="color: #6b7280;">AI-powered insights for smarter shopping</p>
-    </div>
-    """, unsafe_allow_html=True)
+    render_analysis_header()
 
     # Summary metrics
     col1, col2, col3, col4 = st.columns(4)
@@ -552,81 +650,14 @@ def analysis_page():
     categories = analysis["categories"]
 
     if any(categories.values()):
-        fig = px.pie(
-            values=list(categories.values()),
-            names=list(categories.keys()),
-            title="Your Shopping Categories",
-            color_discrete_map={
-                "Essential": "#10b981",
-                "Treat": "#f59e0b",
-                "Luxury": "#ef4444",
-                "Impulse": "#8b5cf6"
-            }
-        )
+        fig = get_figure_cache().get(category_pie, tuple(categories.items()))
         st.plotly_chart(fig, use_container_width=True)
 
     # Item-by-item analysis
     st.markdown("### 🔍 Item Analysis")
 
     for item in analysis["items"]:
-        item_name = item['name']
-        verdict_class = "keep-item" if "Keep" in item["verdict"] else \
-                      "reconsider-item" if "Reconsider" in item["verdict"] else "optional-item"
-
-        # Check if item is justified
-        if item_name in st.session_state.justified_items:
-            verdict_class = "justified-item"
-
-        st.markdown(f"""
-        <div class="analysis-card {verdict_class}">
-            <h4>{item['emoji']} {item['name']} - ₹{item['price']}</h4>
-            <p><strong>{item['verdict']}</strong></p>
-            <p>{item['suggestion']}</p>
-            {f"<p><em>Your reason: {item['reason']}</em></p>" if item['reason'] else ""}
-        </div>
-        """, unsafe_allow_html=True)
-
-        # Justify item functionality
-        if "Reconsider" in item["verdict"] and item_name not in st.session_state.justified_items:
-            col1, col2 = st.columns([1, 3])
-
-            with col1:
-                if st.button(f"💭 Justify", key=f"justify_btn_{item_name}"):
-                    st.session_state.show_justification[item_name] = True
-                    st.rerun()
-
-            # Show justification form if requested
-            if st.session_state.show_justification.get(item_name, False):
-                with col2:
-                    with st.form(key=f"justify_form_{item_name}"):
-                        justification = st.text_area(
-                            f"Why do you need {item['name']}?",
-                            placeholder="Explain your reasoning...",
-                            key=f"justification_text_{item_name}"
-                        )
-
-                        col_a, col_b = st.columns(2)
-                        with col_a:
-                            if st.form_submit_button("✅ Justify Purchase"):
-                                if justification.strip():
-                                    st.session_state.justified_items[item_name] = justification
-                                    st.session_state.show_justification[item_name] = False
-                                    st.success(f"Thanks for explaining! {item['name']} has been justified.")
-                                    st.rerun()
-                                else:
-                                    st.error("Please provide a reason.")
-
-                        with col_b:
-                            if st.form_submit_button("❌ Cancel"):
-                                st.session_state.show_justification[item_name] = False
-                                st.rerun()
-
-        # Show justified items
-        elif item_name in st.session_state.justified_items:
-            st.success(f"✅ Justified: {st.session_state.justified_items[item_name]}")
-            if st.button(f"Remove Justification", key=f"remove_justification_{item_name}"):
-                del st.session_state.justified_items[item_name]
-                st.rerun()
+        item_review(item)
 
     # Shopping personality
     st.markdown("### 🧠 Your Shopping Personality")
@@ -643,24 +674,16 @@ def analysis_page():
     with col3:
         st.metric("Emotional", f"{personality['emotional']}%")
 
+    if analysis["summary"]["flagged_items"]:
+        st.success(f"🎁 {analysis['summary']['reward_recommendation']}")
+
     # 10-second reflection pause
     st.markdown("---")
     st.markdown("### ⏱️ Take a Moment to Reflect")
 
     if st.button("🧘 10-Second Reflection", key="reflection"):
-        placeholder = st.empty()
-        for i in range(10, 0, -1):
-            placeholder.markdown(f"""
-            <div style="text-align: center; font-size: 2rem; padding: 2rem;">
-                Think about your purchases... {i}
-            </div>
-            """, unsafe_allow_html=True)
-            time.sleep(1)
-        placeholder.markdown("""
-        <div style="text-align: center; font-size: 1.5rem; padding: 2rem; color: #10b981;">
-            ✨ Reflection complete! You're ready to decide.
-        </div>
-        """, unsafe_allow_html=True)
+        # The countdown runs in the browser so no script thread sits idle
+        components.html(REFLECTION_COUNTDOWN_HTML, height=140)
 
     # Action buttons
     st.markdown("---")
@@ -674,24 +697,22 @@ def analysis_page():
     with col2:
         if st.button("✅ Confirm Order"):
             # Save to history
-            st.session_state.session_history.append({
-                "date": datetime.now().strftime("%Y-%m-%d %H:%M"),
-                "items": len(st.session_state.cart),
-                "total": sum(item['price'] for item in st.session_state.cart),
-                "savings": analysis["summary"]["estimated_savings"],
-                "identity": analysis["summary"]["identity_badge"]
-            })
-
-            st.success("🎉 Order confirmed! Thank you for shopping mindfully!")
-            st.balloons()
+            get_history_store().record_session(
+                current_user_id(),
+                analysis["items"],
+                analysis["summary"]["estimated_savings"],
+                analysis["summary"]["identity_badge"]
+            )
+            st.session_state.history_page = 0
 
             # Reset cart and justifications
-            st.session_state.cart = []
+            st.session_state.cart.clear()
             st.session_state.analysis_result = None
             st.session_state.justified_items = {}
             st.session_state.show_justification = {}
 
-            time.sleep(2)
+            # Celebrate on the next run instead of holding this one open
+            st.session_state.order_confirmed = True
             st.session_state.current_page = 'landing'
             st.rerun()
 
@@ -699,6 +720,13 @@ def analysis_page():
         if st.button("📜 View History"):
             st.session_state.current_page = 'history'
             st.rerun()
+
+HISTORY_PAGE_SIZE = 10
+HISTORY_CHART_SESSIONS = 100
+
+def change_history_page(step):
+    st.session_state.history_page += step
+
 def history_page():
     """Session history with progress tracking"""
     st.markdown("""
@@ -708,11 +736,13 @@ def history_page():
     </div>
     """, unsafe_allow_html=True)
 
-    if st.session_state.session_history:
-        # Progress metrics
-        total_sessions = len(st.session_state.session_history)
-        total_savings = sum(session['savings'] for session in st.session_state.session_history)
-        avg_items = sum(session['items'] for session in st.session_state.session_history) / total_sessions
+    store = get_history_store()
+    user_id = current_user_id()
+    summary = store.summary(user_id)
+
+    if summary:
+        # Progress metrics come from the running totals, not a rescan of every session
+        total_sessions = summary["total_sessions"]
 
         col1, col2, col3 = st.columns(3)
 
@@ -720,45 +750,54 @@ def history_page():
             st.metric("Total Sessions", total_sessions)
 
         with col2:
-            st.metric("Total Savings", f"₹{total_savings:.0f}")
+            st.metric("Total Savings", f"₹{summary['total_savings']:.0f}")
 
         with col3:
-            st.metric("Avg Items/Session", f"{avg_items:.1f}")
+            st.metric("Avg Items/Session", f"{summary['avg_items']:.1f}")
 
         # Progress chart
         st.markdown("### 📈 Savings Progress")
 
-        df = pd.DataFrame(st.session_state.session_history)
-        fig = px.line(
-            df,
-            x='date',
-            y='savings',
-            title='Your Savings Over Time',
-            labels={'savings': 'Savings (₹)', 'date': 'Date'}
-        )
+        series = store.savings_series(user_id, limit=HISTORY_CHART_SESSIONS)
+        fig = get_figure_cache().get(savings_line, tuple(series))
         st.plotly_chart(fig, use_container_width=True)
 
         # Session details
         st.markdown("### 🗂️ Session Details")
 
-        for i, session in enumerate(reversed(st.session_state.session_history)):
+        page_count = max(1, -(-total_sessions // HISTORY_PAGE_SIZE))
+        page = min(st.session_state.history_page, page_count - 1)
+        sessions = store.sessions(user_id, page=page, page_size=HISTORY_PAGE_SIZE)
+
+        for i, session in enumerate(sessions):
             st.markdown(f"""
             <div class="analysis-card">
-                <h4>Session {len(st.session_state.session_history) - i}</h4>
+                <h4>Session {total_sessions - page * HISTORY_PAGE_SIZE - i}</h4>
                 <p><strong>Date:</strong> {session['date']}</p>
                 <p><strong>Items:</strong> {session['items']}</p>
-                <p><strong>Total:</strong> ₹{session['total']}</p>
+                <p><strong>Total:</strong> ₹{session['total']:.0f}</p>
                 <p><strong>Savings:</strong> ₹{session['savings']:.0f}</p>
                 <p><strong>Identity:</strong> {session['identity']}</p>
             </div>
             """, unsafe_allow_html=True)
 
+        if page_count > 1:
+            prev_col, info_col, next_col = st.columns([1, 2, 1])
+            with prev_col:
+                st.button("◀ Newer", key="history_prev", disabled=page == 0,
+                          on_click=change_history_page, args=(-1,))
+            with info_col:
+                st.markdown(
+                    f"<p style='text-align: center; color: #6b7280;'>Page {page + 1} of {page_count}</p>",
+                    unsafe_allow_html=True
+                )
+            with next_col:
+                st.button("Older ▶", key="history_next", disabled=page >= page_count - 1,
+                          on_click=change_history_page, args=(1,))
+
         # Improvement message
         if total_sessions > 1:
-            recent_savings = st.session_state.session_history[-1]['savings']
-            prev_savings = st.session_state.session_history[-2]['savings']
-
-            if recent_savings > prev_savings:
+            if summary["last_savings"] > summary["previous_savings"]:
                 st.success("🎉 You've improved your mindful shopping! Keep it up!")
             else:
                 st.info("💡 You're doing great! Remember to take time to reflect before purchasing.")
@@ -773,16 +812,23 @@ def history_page():
 
 def main():
     """Main application logic"""
-
-    # Navigation
-    if st.session_state.current_page == 'landing':
-        landing_page()
-    elif st.session_state.current_page == 'cart_builder':
-        cart_builder_page()
-    elif st.session_state.current_page == 'analysis':
-        analysis_page()
-    elif st.session_state.current_page == 'history':
-        history_page()
+    start_metrics_endpoint()
+
+    if st.session_state.pop('order_confirmed', False):
+        st.toast("🎉 Order confirmed! Thank you for shopping mindfully!")
+        st.balloons()
+
+    # Navigation; timed per page, including runs cut short by st.rerun()
+    page = st.session_state.current_page
+    with metrics.PAGE_RENDER_SECONDS.time(page=page):
+        if page == 'landing':
+            landing_page()
+        elif page == 'cart_builder':
+            cart_builder_page()
+        elif page == 'analysis':
+            analysis_page()
+        elif page == 'history':
+            history_page()
 
     # Sidebar for navigation
     with st.sidebar:
@@ -0,0 +1,206 @@
+"""Offline benchmarks for the cart analysis pipeline.
+
+Runs without an API key: the app is driven through the replay LLM backend,
+which answers every prompt with a synthetic but well-formed response.
+
+    python benchmarks/bench_analysis.py                      # print results
+    python benchmarks/bench_analysis.py --save base.json     # record a baseline
+    python benchmarks/bench_analysis.py --compare base.json  # fail on regressions
+
+Cases:
+    prompt_build[n]   build_analysis_prompt for a cart of n pending items
+    parse[n]          streaming extraction and validation of an n-item response
+    fallback[n]       rule-based Analyzer.fallback
+    analyze[n]        Analyzer.analyze end to end, caches cleared
+    bulk_score[n]     vectorized score_carts over n items in carts of 8
+    render[page]      one full script run of a page under AppTest
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("MINDCART_LLM_BACKEND", "replay")
+os.environ.setdefault("MINDCART_HISTORY_DB", "memory")
+os.environ.setdefault("MINDCART_BATCH_WINDOW_MS", "0")
+os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+
+SIZES = [1, 10, 100, 1000, 10000]
+QUICK_SIZES = [1, 10, 100]
+PAGES = ["landing", "cart_builder", "analysis", "history"]
+
+
+def run_case(fn, rounds, warmup=1):
+    """Time ``fn`` and return summary statistics in seconds"""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    median = statistics.median(timings)
+    return {
+        "rounds": rounds,
+        "min": min(timings),
+        "max": max(timings),
+        "mean": statistics.fmean(timings),
+        "median": median,
+        "stddev": statistics.stdev(timings) if rounds > 1 else 0.0,
+        "ops": 1 / median if median else float("inf"),
+    }
+
+
+def rounds_for(size, budget):
+    # Fewer rounds for big carts so the whole suite stays within a few minutes
+    return max(3, min(budget, 20000 // max(size, 1)))
+
+
+def make_cart(catalog, size):
+    skus = [product.sku for product in catalog]
+    return [{"sku": skus[i % len(skus)], "reason": f"reason {i}"} for i in range(size)]
+
+
+def pipeline_cases(analyzer, sizes, budget):
+    import pandas as pd
+
+    from mindcart.analysis import build_analysis_prompt
+    from mindcart.llm import synthetic_response
+    from mindcart.schema import validate_record
+    from mindcart.scoring import score_carts
+    from mindcart.streaming import JSONRecordExtractor
+
+    catalog = analyzer.catalog
+    cases = {}
+    for size in sizes:
+        cart = make_cart(catalog, size)
+        payload = {
+            "goal": "Balanced Shopping",
+            "items": [
+                {"id": i, "name": catalog[item["sku"]].name, "price": catalog[item["sku"]].price,
+                 "category": catalog[item["sku"]].category, "quantity": 1, "reason": item["reason"]}
+                for i, item in enumerate(cart)
+            ],
+            "decided": [],
+        }
+        prompt = build_analysis_prompt([("c0", payload)])
+        response = synthetic_response(prompt)
+
+        def parse(response=response):
+            parser = JSONRecordExtractor(validate=validate_record)
+            for start in range(0, len(response), 80):
+                parser.feed(response[start:start + 80])
+            parser.close()
+
+        def analyze(cart=cart):
+            analyzer.analysis_cache.clear()
+            analyzer.item_cache.clear()
+            if analyzer.reason_cache is not None:
+                analyzer.reason_cache.clear()
+            analyzer.analyze(cart, "Balanced Shopping")
+
+        bulk = pd.DataFrame({
+            "cart_id": [i // 8 for i in range(size)],
+            "sku": [item["sku"] for item in cart],
+            "goal": "Balanced Shopping",
+        })
+
+        rounds = rounds_for(size, budget)
+        cases[f"prompt_build[{size}]"] = run_case(
+            lambda payload=payload: build_analysis_prompt([("c0", payload)]), rounds)
+        cases[f"parse[{size}]"] = run_case(parse, rounds)
+        cases[f"fallback[{size}]"] = run_case(
+            lambda cart=cart: analyzer.fallback(cart, "Balanced Shopping"), rounds)
+        cases[f"analyze[{size}]"] = run_case(analyze, rounds)
+        cases[f"bulk_score[{size}]"] = run_case(
+            lambda bulk=bulk: score_carts(bulk, catalog, analyzer.rule_engine), rounds)
+    return cases
+
+
+def render_cases(catalog, rounds, cart_size=10):
+    from streamlit.testing.v1 import AppTest
+
+    from mindcart.cart import Cart
+
+    def render(page):
+        at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60)
+        if page != "landing":
+            cart = Cart()
+            for item in make_cart(catalog, cart_size):
+                cart.add(catalog[item["sku"]], reason=item["reason"])
+            at.session_state["current_page"] = page
+            at.session_state["cart"] = cart
+        if page == "analysis":
+            at.session_state["analysis_pending"] = True
+        at.run()
+        if at.exception:
+            raise RuntimeError(f"{page} page raised: {at.exception[0].value}")
+
+    return {f"render[{page}]": run_case(lambda page=page: render(page), rounds) for page in PAGES}
+
+
+def compare(results, baseline, threshold):
+    """Print median changes against ``baseline``; return the names that regressed"""
+    regressions = []
+    for name, stats in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:28} {'new':>10}")
+            continue
+        change = (stats["median"] - before["median"]) / before["median"] if before["median"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:28} {change:+10.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="only small carts and fewer rounds")
+    parser.add_argument("--no-render", action="store_true", help="skip the AppTest page renders")
+    parser.add_argument("--rounds", type=int, default=50, help="max rounds per pipeline case")
+    parser.add_argument("--save", metavar="PATH", help="write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare medians against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative median slowdown counted as a regression (default 0.2)")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    from mindcart.analysis import Analyzer
+
+    analyzer = Analyzer.from_env()
+    sizes = QUICK_SIZES if args.quick else SIZES
+    results = pipeline_cases(analyzer, sizes, 10 if args.quick else args.rounds)
+    if not args.no_render:
+        results.update(render_cases(analyzer.catalog, 3 if args.quick else 5))
+
+    print(f"{'case':28} {'min ms':>10} {'median ms':>10} {'mean ms':>10} {'stddev':>10} {'ops/s':>10}")
+    for name, stats in results.items():
+        print(f"{name:28} {stats['min'] * 1000:10.3f} {stats['median'] * 1000:10.3f} "
+              f"{stats['mean'] * 1000:10.3f} {stats['stddev'] * 1000:10.3f} {stats['ops']:10.1f}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print()
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
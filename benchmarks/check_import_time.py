@@ -0,0 +1,91 @@
+"""Cold-start budget check for the Streamlit app.
+
+Imports app.py in fresh interpreters under ``-X importtime`` and fails if
+
+- the app's own import cost (everything beyond Streamlit itself, which
+  the server has loaded before any script runs) exceeds the budget, or
+- a heavy dependency that should load lazily is imported at startup.
+
+    python benchmarks/check_import_time.py
+    python benchmarks/check_import_time.py --budget-ms 150 --runs 7 --top 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must only be imported on first analysis, chart or service use
+LAZY_MODULES = [
+    "google.generativeai",
+    "pandas",
+    "numpy",
+    "plotly.express",
+    "fastapi",
+    "sklearn",
+]
+
+PROBE = """
+import json, sys
+import streamlit, streamlit.components.v1
+import app
+print("LOADED " + json.dumps([m for m in {lazy!r} if m in sys.modules]))
+"""
+
+
+def import_once():
+    """(app import microseconds, per-module cumulative times, lazily-loaded modules found)"""
+    env = dict(os.environ, STREAMLIT_LOGGER_LEVEL="error")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(lazy=LAZY_MODULES)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                modules[name.strip()] = int(cumulative)
+    loaded = []
+    for line in result.stdout.splitlines():
+        if line.startswith("LOADED "):
+            loaded = json.loads(line[len("LOADED "):])
+    return modules["app"], modules, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float,
+                        default=float(os.environ.get("MINDCART_IMPORT_BUDGET_MS", 150)),
+                        help="max median import time of app.py beyond Streamlit (default 150)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="show the slowest N modules")
+    args = parser.parse_args()
+
+    timings = []
+    for _ in range(args.runs):
+        app_us, modules, loaded = import_once()
+        timings.append(app_us / 1000)
+    median = statistics.median(timings)
+
+    print(f"app.py import beyond Streamlit: median {median:.1f} ms over {args.runs} runs "
+          f"(min {min(timings):.1f}, max {max(timings):.1f}, budget {args.budget_ms:.0f})")
+    print("\nSlowest imports in the last run (cumulative ms):")
+    for name, us in sorted(modules.items(), key=lambda m: -m[1])[:args.top]:
+        print(f"  {us / 1000:8.1f}  {name}")
+
+    failed = False
+    if loaded:
+        print(f"\nFAIL: imported at startup but should load lazily: {', '.join(loaded)}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"\nFAIL: import time {median:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,366 @@
+"""Multi-session load test of the Streamlit app.
+
+Starts ``streamlit run app.py`` with the replay LLM backend (configurable
+latency, no API key needed) and drives many simulated shoppers through
+landing -> cart builder -> analysis -> history over the app's websocket,
+speaking the same protocol as the browser: every click or edit sends a
+rerun request with the session's widget states, and the rerun is timed
+until the server reports the script finished.
+
+    python benchmarks/load_test.py --sessions 200 --concurrency 50
+    python benchmarks/load_test.py --llm-latency-ms 1500 --save load.json
+    python benchmarks/load_test.py --compare load.json   # fail on regressions
+
+Reported are p50/p95/p99 rerun latency overall and per step, completed
+sessions and reruns per second, and server memory: the growth of the
+server's RSS while the finished sessions stay connected, divided by their
+number, and its peak RSS. Carts are drawn at random from the catalog with
+``--seed``, so sessions don't all hit the same analysis cache entry.
+Compare baselines recorded with the same options and a few hundred
+sessions; per-step percentiles of small runs are mostly noise.
+``--url`` targets a server that is already running instead; memory is
+then not measured.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REASONS = [
+    "", "need it for work", "for work", "work use", "birthday gift", "gift for a friend",
+    "treat myself", "ran out", "running low", "saw it on sale", "weekend party", "just because",
+]
+GOALS = ["Essentials Only", "Balanced Shopping", "Treat Yourself", "Gift Shopping"]
+STEPS = ["landing", "start_cart", "add_item", "reason", "analyze", "confirm", "history"]
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of ``values`` (0 < q <= 100)"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def process_memory(pid):
+    """(current, peak) RSS of ``pid`` in bytes, or None where /proc is unavailable"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["VmRSS"].split()[0]) * 1024, int(fields["VmHWM"].split()[0]) * 1024
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def widget_key(widget_id):
+    """User key of a widget id (``$$ID-<hash>-<key>``), or None for unkeyed widgets"""
+    parts = widget_id.split("-", 2)
+    return parts[2] if len(parts) == 3 and parts[2] != "None" else None
+
+
+class Session:
+    """One simulated shopper on its own websocket; ``timings`` holds (step, seconds) per rerun"""
+
+    def __init__(self, url, rng, cart_size, think_seconds):
+        self.url = url
+        self.rng = rng
+        self.cart_size = cart_size
+        self.think_seconds = think_seconds
+        self.timings = []
+        self.websocket = None
+        self.query_string = ""
+        self.values = {}  # widget id -> (value field, value), sent with every rerun like the browser does
+        self.widgets = []  # (kind, widget proto) rendered by the last run
+        self.flow_done = asyncio.Event()
+
+    async def rerun(self, step, trigger=None):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        if self.think_seconds:
+            await asyncio.sleep(self.rng.uniform(0, 2 * self.think_seconds))
+        message = BackMsg()
+        client_state = message.rerun_script
+        client_state.query_string = self.query_string
+        for widget_id, (field, value) in self.values.items():
+            state = client_state.widget_states.widgets.add(id=widget_id)
+            setattr(state, field, value)
+        if trigger is not None:
+            client_state.widget_states.widgets.add(id=trigger, trigger_value=True)
+
+        started = time.perf_counter()
+        await self.websocket.send(message.SerializeToString())
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await self.websocket.recv())
+            kind = forward.WhichOneof("type")
+            if kind == "new_session":
+                # Sent whenever a script run starts, including runs restarted by st.rerun()
+                self.widgets = []
+            elif kind == "page_info_changed":
+                self.query_string = forward.page_info_changed.query_string
+            elif kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                element = forward.delta.new_element
+                element_type = element.WhichOneof("type")
+                if element_type == "exception":
+                    raise RuntimeError(f"{step} raised {element.exception.type}: {element.exception.message}")
+                if element_type in ("button", "text_input", "selectbox"):
+                    self.widgets.append((element_type, getattr(element, element_type)))
+            elif kind == "script_finished":
+                if forward.script_finished == ForwardMsg.FINISHED_SUCCESSFULLY:
+                    break
+                if forward.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    raise RuntimeError(f"{step}: app.py failed to compile")
+        self.timings.append((step, time.perf_counter() - started))
+
+    def widget(self, kind, key=None, label=None):
+        for widget_kind, widget in self.widgets:
+            if widget_kind == kind and (widget_key(widget.id) == key if key else widget.label == label):
+                return widget.id
+        raise RuntimeError(f"no {kind} {key or label!r} in the last run")
+
+    async def run(self, finished):
+        import websockets
+
+        async with websockets.connect(self.url, subprotocols=["streamlit"], max_size=None) as self.websocket:
+            await self.rerun("landing")
+            self.values[self.widget("selectbox", key="shopping_goal_selector")] = (
+                "string_value", self.rng.choice(GOALS))
+            await self.rerun("start_cart", self.widget("button", key="start_cart"))
+
+            skus = [widget_key(widget.id)[len("add_"):] for kind, widget in self.widgets
+                    if kind == "button" and (widget_key(widget.id) or "").startswith("add_")]
+            for sku in self.rng.sample(skus, min(self.cart_size, len(skus))):
+                await self.rerun("add_item", self.widget("button", key=f"add_{sku}"))
+                reason = self.rng.choice(REASONS)
+                if reason:
+                    self.values[self.widget("text_input", key=f"reason_{sku}")] = ("string_value", reason)
+                    await self.rerun("reason")
+
+            # The streaming run ends in st.rerun(); the step lasts until the results page has rendered
+            await self.rerun("analyze", self.widget("button", key="analyze_cart"))
+            await self.rerun("confirm", self.widget("button", label="✅ Confirm Order"))
+            self.values.clear()
+            await self.rerun("history", self.widget("button", label="📜 History"))
+            self.flow_done.set()
+            # Stay connected, so the server still holds this session when memory is measured
+            await finished.wait()
+
+    async def start(self, finished):
+        """Task running the session, returned once its flow is through; raises if the flow failed"""
+        task = asyncio.create_task(self.run(finished))
+        flow_done = asyncio.create_task(self.flow_done.wait())
+        await asyncio.wait([task, flow_done], return_when=asyncio.FIRST_COMPLETED)
+        if not self.flow_done.is_set():
+            flow_done.cancel()
+            task.result()
+        return task
+
+
+async def run_sessions(url, sessions, concurrency, cart_size, think_seconds, seed, llm_latency_ms, server_pid):
+    """Run the sessions; returns (results dict, failures)"""
+    finished = asyncio.Event()
+    # Loads the catalog, analyzer and history store outside the measurement
+    warm_up = await Session(url, random.Random(seed - 1), cart_size, 0).start(finished)
+    finished.set()
+    await warm_up
+    finished.clear()
+
+    limit = asyncio.Semaphore(concurrency)
+    done = []
+    failures = []
+
+    async def simulate(rng):
+        session = Session(url, rng, cart_size, think_seconds)
+        # The slot frees up once the flow is through, while the connection stays open
+        async with limit:
+            try:
+                task = await session.start(finished)
+            except Exception as e:
+                failures.append(repr(e))
+                return None
+        done.append(session)
+        return task
+
+    memory_before = process_memory(server_pid) if server_pid else None
+    started = time.perf_counter()
+    tasks = await asyncio.gather(*(simulate(random.Random(seed * 100003 + i)) for i in range(sessions)))
+    elapsed = time.perf_counter() - started
+    memory_after = process_memory(server_pid) if server_pid else None
+    finished.set()
+    await asyncio.gather(*(task for task in tasks if task is not None), return_exceptions=True)
+
+    timings = [seconds for session in done for _, seconds in session.timings]
+    by_step = {}
+    for session in done:
+        for step, seconds in session.timings:
+            by_step.setdefault(step, []).append(seconds)
+
+    def summary(values):
+        return {
+            "count": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": max(values, default=0.0),
+        }
+
+    results = {
+        "config": {
+            "sessions": sessions, "concurrency": concurrency, "cart_size": cart_size,
+            "think_seconds": think_seconds, "seed": seed,
+            "llm_latency_ms": llm_latency_ms,
+        },
+        "completed": len(done),
+        "failed": len(failures),
+        "elapsed": elapsed,
+        "sessions_per_second": len(done) / elapsed if elapsed else 0.0,
+        "reruns_per_second": len(timings) / elapsed if elapsed else 0.0,
+        "reruns": summary(timings),
+        "steps": {step: summary(by_step[step]) for step in STEPS if step in by_step},
+    }
+    if memory_before and memory_after:
+        results["memory_per_session_kb"] = max(memory_after[0] - memory_before[0], 0) / 1024 / max(len(done), 1)
+        results["server_rss_mb"] = memory_after[0] / 2 ** 20
+        results["server_peak_rss_mb"] = memory_after[1] / 2 ** 20
+    return results, failures
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, log):
+    """``streamlit run app.py`` on ``port``; returns the process once it is healthy"""
+    server = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", "app.py", "--server.headless", "true",
+         "--server.address", "127.0.0.1", "--server.port", str(port),
+         "--browser.gatherUsageStats", "false", "--server.fileWatcherType", "none"],
+        cwd=ROOT, stdout=log, stderr=subprocess.STDOUT,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"streamlit exited with status {server.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("streamlit did not become healthy within 60s")
+
+
+def report(results):
+    config = results["config"]
+    latency = f"{config['llm_latency_ms']:.0f}ms" if config["llm_latency_ms"] is not None else "set by the server"
+    print(f"{results['completed']} sessions completed, {results['failed']} failed in {results['elapsed']:.1f}s "
+          f"(concurrency {config['concurrency']}, {config['cart_size']} items per cart, LLM latency {latency})")
+    print(f"throughput: {results['sessions_per_second']:.2f} sessions/s, "
+          f"{results['reruns_per_second']:.1f} reruns/s")
+    if "memory_per_session_kb" in results:
+        print(f"server memory: {results['memory_per_session_kb']:.0f} KB per session, "
+              f"{results['server_rss_mb']:.0f} MB RSS, {results['server_peak_rss_mb']:.0f} MB peak")
+    print()
+    print(f"{'rerun latency':16} {'count':>8} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for name, stats in [("all", results["reruns"])] + list(results["steps"].items()):
+        print(f"{name:16} {stats['count']:8} {stats['p50'] * 1000:10.1f} {stats['p95'] * 1000:10.1f} "
+              f"{stats['p99'] * 1000:10.1f} {stats['max'] * 1000:10.1f}")
+
+
+def compare(results, baseline, threshold):
+    """Print changes against ``baseline``; return the measures that regressed"""
+    # (name, current, before, True if higher is better)
+    measures = [(f"rerun {q}", results["reruns"][q], baseline["reruns"][q], False) for q in ("p50", "p95", "p99")]
+    measures += [(f"{step} p95", stats["p95"], baseline["steps"][step]["p95"], False)
+                 for step, stats in results["steps"].items() if step in baseline.get("steps", {})]
+    measures.append(("sessions/s", results["sessions_per_second"], baseline["sessions_per_second"], True))
+    if "memory_per_session_kb" in results and "memory_per_session_kb" in baseline:
+        measures.append(("memory/session", results["memory_per_session_kb"], baseline["memory_per_session_kb"], False))
+    if baseline.get("config") != results["config"]:
+        print("warning: baseline was recorded with a different configuration\n")
+
+    regressions = []
+    for name, current, before, higher_is_better in measures:
+        change = (current - before) / before if before else 0.0
+        flag = ""
+        if (-change if higher_is_better else change) > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:20} {change:+10.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100, help="simulated shoppers (default 100)")
+    parser.add_argument("--concurrency", type=int, default=20, help="shoppers active at once (default 20)")
+    parser.add_argument("--cart-size", type=int, default=5, help="items each shopper adds (default 5)")
+    parser.add_argument("--think-ms", type=float, default=0,
+                        help="mean pause before each interaction, drawn uniformly from 0 to twice this")
+    parser.add_argument("--llm-latency-ms", type=float, default=800,
+                        help="replay backend latency of the started server (default 800)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--url", help="websocket of a running server, e.g. ws://localhost:8501/_stcore/stream")
+    parser.add_argument("--server-log", default=os.devnull, help="where the started server's output goes")
+    parser.add_argument("--save", metavar="PATH", help="write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative change counted as a regression (default 0.2)")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        # Read by the server's analyzer; the replay backend answers every prompt after the latency
+        os.environ["MINDCART_LLM_BACKEND"] = "replay"
+        os.environ["MINDCART_REPLAY_LATENCY_MS"] = str(args.llm_latency_ms)
+        os.environ.setdefault("MINDCART_HISTORY_DB", "memory")
+        port = free_port()
+        log = open(args.server_log, "w")
+        server = start_server(port, log)
+        url = f"ws://127.0.0.1:{port}/_stcore/stream"
+
+    try:
+        results, failures = asyncio.run(run_sessions(
+            url, args.sessions, args.concurrency, args.cart_size, args.think_ms / 1000, args.seed,
+            args.llm_latency_ms if server else None, server.pid if server else None))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+            log.close()
+
+    report(results)
+    for failure in sorted(set(failures))[:5]:
+        print(f"failure: {failure}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    status = 1 if failures else 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print()
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} measure(s) regressed by more than {args.threshold:.0%}")
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Supporting modules for the MindCart Streamlit app."""
@@ -0,0 +1,558 @@
+"""Cart analysis, independent of any UI.
+
+``Analyzer`` runs the whole pipeline for a cart: cached results, the rule
+engine's confident verdicts, previously judged items, and finally one
+(possibly batched) LLM call for whatever is left. Failures degrade to the
+rule-based fallback analysis instead of raising. The Streamlit app and the
+HTTP service in ``mindcart.service`` both use it.
+
+Carts are lists of dicts with a ``sku`` and an optional ``quantity``
+(default 1) and ``reason``; each SKU appears once.
+"""
+import functools
+import logging
+import os
+import textwrap
+import time
+
+from mindcart import metrics
+from mindcart.batching import CartBatcher
+from mindcart.cache import ResponseCache, make_cache_key, make_item_cache_key
+from mindcart.catalog import Catalog
+from mindcart.distill import VerdictLog, VerdictModel, log_row
+from mindcart.insights import summarize_cart
+from mindcart.llm import CircuitOpenError, RecordingBackend, ReplayBackend
+from mindcart.rules import NEUTRAL_SUGGESTION, OPTIONAL, RECONSIDER, RuleEngine
+from mindcart.similarity import SimilarityCache
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL = "gemini-1.5-flash"
+# Bump whenever the prompt below changes so stale cached analyses are ignored
+PROMPT_VERSION = 7
+# Per-cart prompt size; MINDCART_PROMPT_TOKEN_BUDGET overrides it
+DEFAULT_PROMPT_TOKEN_BUDGET = 4000
+
+
+PROMPT_PREAMBLE = textwrap.dedent("""\
+    You are a shopping psychology expert analyzing customers' carts.
+
+    Each cart starts with "## cart <cart_id>" and its shopping goal, followed by pipe-separated tables:
+    - items: the items to judge, one row per item id; qty is the number of units
+    - decided: other items already in the cart (verdicts decided, do not repeat them)
+    - summarized: further items in the cart, totalled per category (do not judge them)
+
+    For each row in a cart's items table, provide:
+    1. A verdict: "✅ Keep", "⚠️ Reconsider", or "🤔 Optional"
+    2. A personalized suggestion based on behavioral psychology
+    3. Consider the shopping goal and item necessity
+
+    Respond in JSON Lines: one compact JSON object per line, with no markdown fences and no other text.
+    Answer the carts one after another. For each cart, first write one line per row of its items table, in order:
+    {"cart": "cart_id", "type": "item", "id": item_id, "verdict": "verdict", "suggestion": "detailed_suggestion"}
+    Then finish that cart with exactly one end line:
+    {"cart": "cart_id", "type": "end"}
+    """)
+MAX_REASON_CHARS = 120
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token)"""
+    return len(text) // 4 + 1
+
+
+def _cell(value, limit=None):
+    text = " ".join(str(value).split()).replace("|", "/")
+    return text[:limit] if limit else text
+
+
+def _goal_line(goal):
+    return f"goal: {_cell(goal or 'General Shopping')}"
+
+
+def _row_budget(goal, token_budget):
+    # Room left for table rows once the cart heading, goal and table headers are in
+    return token_budget - estimate_tokens(_goal_line(goal)) - 40
+
+
+def _item_row(item):
+    return (f"{item['id']}|{_cell(item['name'])}|{item['category']}|{item['price']}|{item['quantity']}|"
+            f"{_cell(item['reason'], MAX_REASON_CHARS)}")
+
+
+def split_items_by_budget(items, goal, token_budget):
+    """(ids listed, ids left over) for a cart's items table under ``token_budget``
+
+    Follows ``_cart_section``: the costliest rows are listed first and a
+    row that doesn't fit is totalled per category, which leaves it
+    unanswered, so callers decide the left-over ids some other way.
+    """
+    remaining = _row_budget(goal, token_budget)
+    listed, left_over = [], []
+    for item in sorted(items, key=lambda item: -item["price"] * item["quantity"]):
+        cost = estimate_tokens(_item_row(item))
+        if cost <= remaining:
+            listed.append(item["id"])
+            remaining -= cost
+        else:
+            left_over.append(item["id"])
+    return listed, left_over
+
+
+def _cart_section(cart_id, payload, token_budget):
+    lines = [f"## cart {cart_id}", _goal_line(payload["goal"])]
+    remaining = _row_budget(payload["goal"], token_budget)
+
+    # Identical decided lines only need one row
+    decided = {}
+    for item in payload["decided"]:
+        key = (item["name"], item["category"], item["price"], item["verdict"])
+        decided[key] = decided.get(key, 0) + item["quantity"]
+
+    # Itemize the costliest rows first; items to judge before decided context
+    rows = [("item", item, item["price"] * item["quantity"], _item_row(item)) for item in payload["items"]]
+    rows.sort(key=lambda row: -row[2])
+    decided_rows = [
+        ("decided", {"category": category, "quantity": quantity}, price * quantity,
+         f"{_cell(name)}|{category}|{price}|{quantity}|{verdict}")
+        for (name, category, price, verdict), quantity in decided.items()
+    ]
+    decided_rows.sort(key=lambda row: -row[2])
+
+    itemized = {"item": [], "decided": []}
+    overflow = {}
+    for kind, item, value, text in rows + decided_rows:
+        cost = estimate_tokens(text)
+        if cost <= remaining:
+            itemized[kind].append((item, text))
+            remaining -= cost
+            continue
+        count, units, total = overflow.get(item["category"], (0, 0, 0))
+        overflow[item["category"]] = (count + 1, units + item["quantity"], total + value)
+        metrics.PROMPT_OVERFLOW_ROWS.inc(kind=kind)
+
+    lines.append("items: id|name|category|price|qty|reason")
+    lines.extend(text for _, text in sorted(itemized["item"], key=lambda row: row[0]["id"]))
+    if itemized["decided"]:
+        lines.append("decided: name|category|price|qty|verdict")
+        lines.extend(text for _, text in itemized["decided"])
+    if overflow:
+        lines.append("summarized: category|lines|units|value")
+        lines.extend(f"{category}|{count}|{units}|{total}" for category, (count, units, total) in overflow.items())
+    return "\n".join(lines)
+
+
+def build_analysis_prompt(carts, token_budget=DEFAULT_PROMPT_TOKEN_BUDGET):
+    """Prompt for one or more carts, each given as (cart_id, payload)
+
+    Every cart section is held to about ``token_budget`` tokens; rows that
+    don't fit, cheapest first, are totalled per category instead of listed.
+    """
+    sections = "\n\n".join(_cart_section(cart_id, payload, token_budget) for cart_id, payload in carts)
+    return f"{PROMPT_PREAMBLE}\n{sections}\n"
+
+
+def replay_analysis(analysis):
+    """Yield a finished analysis as Analyzer.stream events"""
+    for i, item in enumerate(analysis["items"]):
+        yield ("item", i, item)
+    yield ("done", analysis)
+
+
+def build_item_analysis(catalog, item, verdict, suggestion):
+    """Per-item analysis entry shown on the analysis page"""
+    product = catalog[item["sku"]]
+    return {
+        "sku": product.sku,
+        "name": product.name,
+        "emoji": product.emoji,
+        "verdict": verdict,
+        "suggestion": suggestion,
+        "price": product.price,
+        "quantity": item.get("quantity", 1),
+        "reason": item.get("reason", "")
+    }
+
+
+def assemble_analysis(catalog, cart_items, item_analyses, summary):
+    """Merge per-item verdicts (keyed by cart index) into the final analysis"""
+    analysis = {
+        "items": [],
+        "summary": {
+            "total_items": sum(item.get("quantity", 1) for item in cart_items),
+            "flagged_items": 0,
+            "estimated_savings": summary["estimated_savings"],
+            "identity_badge": summary["identity_badge"],
+            "reward_recommendation": summary["reward_recommendation"]
+        },
+        "categories": {"Essential": 0, "Treat": 0, "Luxury": 0, "Impulse": 0},
+        "personality": summary["personality"]
+    }
+
+    for i, item in enumerate(cart_items):
+        quantity = item.get("quantity", 1)
+        analysis["categories"][catalog[item["sku"]].category] += quantity
+
+        item_analysis = item_analyses[i]
+        if item_analysis["verdict"] == RECONSIDER:
+            analysis["summary"]["flagged_items"] += quantity
+
+        analysis["items"].append(item_analysis)
+
+    return analysis
+
+
+def rule_verdict(engine, product, shopping_goal=None):
+    """(verdict, suggestion) of the first matching rule, however confident"""
+    rule = engine.evaluate(product.category, product.price, shopping_goal)
+    if rule is None:
+        return OPTIONAL, NEUTRAL_SUGGESTION
+    return rule.verdict, rule.suggestion
+
+
+def create_fallback_analysis(catalog, engine, cart_items, shopping_goal=None, verdict_model=None):
+    """Rule-based analysis, used directly for clear-cut carts and if the LLM fails
+
+    With a distilled ``verdict_model``, it judges the items the rules aren't
+    confident about, however sure the model is.
+    """
+    item_analyses = {}
+
+    for i, item in enumerate(cart_items):
+        product = catalog[item["sku"]]
+        rule = engine.evaluate(product.category, product.price, shopping_goal)
+        if verdict_model is not None and not engine.is_confident(rule):
+            verdict, suggestion, _ = verdict_model.predict(product, item.get("reason"), shopping_goal)
+            suggestion = suggestion or NEUTRAL_SUGGESTION
+        else:
+            verdict, suggestion = rule_verdict(engine, product, shopping_goal)
+        item_analyses[i] = build_item_analysis(catalog, item, verdict, suggestion)
+
+    summary = summarize_cart(catalog, engine, cart_items, item_analyses, shopping_goal)
+    return assemble_analysis(catalog, cart_items, item_analyses, summary)
+
+
+def load_catalog():
+    """Product catalog from MINDCART_CATALOG (CSV, Parquet or SQLite), else the sample products"""
+    return Catalog.load(os.environ.get("MINDCART_CATALOG"))
+
+
+def load_rule_engine():
+    """Rule engine from MINDCART_RULES_FILE and MINDCART_RULE_CONFIDENCE"""
+    threshold = float(os.environ.get("MINDCART_RULE_CONFIDENCE", 0.8))
+    rules_file = os.environ.get("MINDCART_RULES_FILE")
+    if rules_file:
+        return RuleEngine.from_json(rules_file, confidence_threshold=threshold)
+    return RuleEngine(confidence_threshold=threshold)
+
+
+def load_verdict_model():
+    """Distilled verdict model from MINDCART_VERDICT_MODEL, if configured"""
+    path = os.environ.get("MINDCART_VERDICT_MODEL")
+    if not path:
+        return None
+    threshold = float(os.environ.get("MINDCART_VERDICT_MODEL_CONFIDENCE", 0.85))
+    return VerdictModel.load(path, confidence_threshold=threshold)
+
+
+def load_backend(api_key=None):
+    """LLM backend chosen by MINDCART_LLM_BACKEND
+
+    ``gemini`` (default) calls the API; ``replay`` answers offline with
+    synthetic responses and ``replay:<file>`` with ones recorded by
+    ``record:<file>``, which calls Gemini and saves every exchange.
+    """
+    spec = os.environ.get("MINDCART_LLM_BACKEND", "gemini")
+    kind, _, path = spec.partition(":")
+    if kind == "replay":
+        options = {
+            "latency": float(os.environ.get("MINDCART_REPLAY_LATENCY_MS", 0)) / 1000,
+            "error_rate": float(os.environ.get("MINDCART_REPLAY_ERROR_RATE", 0)),
+        }
+        return ReplayBackend.from_file(path, **options) if path else ReplayBackend(**options)
+
+    # Imported and configured here so offline backends need neither the SDK nor a key
+    import google.generativeai as genai
+
+    from mindcart.gemini_client import GeminiClient
+
+    genai.configure(api_key=api_key or os.environ.get("GEMINI_API_KEY"))
+    client = GeminiClient(
+        GEMINI_MODEL,
+        timeout=float(os.environ.get("MINDCART_GEMINI_TIMEOUT", 20)),
+        max_retries=int(os.environ.get("MINDCART_GEMINI_RETRIES", 3)),
+        max_concurrency=int(os.environ.get("MINDCART_GEMINI_CONCURRENCY", 8))
+    )
+    if kind == "record":
+        return RecordingBackend(client, path)
+    return client
+
+
+class Analyzer:
+    """The analysis pipeline; one instance is shared by every request in a process"""
+
+    def __init__(self, backend, catalog=None, rule_engine=None, analysis_cache=None,
+                 item_cache=None, batcher=None, prompt_version=PROMPT_VERSION,
+                 verdict_model=None, verdict_log=None, reason_cache=None,
+                 prompt_token_budget=DEFAULT_PROMPT_TOKEN_BUDGET):
+        self.backend = backend
+        self.catalog = catalog or Catalog.sample()
+        self.rule_engine = rule_engine or RuleEngine()
+        self.analysis_cache = analysis_cache or ResponseCache()
+        self.item_cache = item_cache or ResponseCache(max_entries=4096, table="item_cache")
+        self.prompt_token_budget = prompt_token_budget
+        self.batcher = batcher or CartBatcher(
+            backend, functools.partial(build_analysis_prompt, token_budget=prompt_token_budget)
+        )
+        self.prompt_version = prompt_version
+        self.verdict_model = verdict_model
+        self.verdict_log = verdict_log
+        self.reason_cache = reason_cache
+
+    @classmethod
+    def from_env(cls, catalog=None, rule_engine=None, api_key=None):
+        """Analyzer configured by the MINDCART_* environment variables"""
+        backend = load_backend(api_key)
+        ttl = int(os.environ.get("MINDCART_CACHE_TTL", 3600))
+        db_path = os.environ.get("MINDCART_CACHE_DB")
+        verdict_log_path = os.environ.get("MINDCART_VERDICT_LOG")
+        reason_cache_size = int(os.environ.get("MINDCART_REASON_CACHE_SIZE", 4096))
+        token_budget = int(os.environ.get("MINDCART_PROMPT_TOKEN_BUDGET", DEFAULT_PROMPT_TOKEN_BUDGET))
+        return cls(
+            backend,
+            catalog=catalog or load_catalog(),
+            rule_engine=rule_engine or load_rule_engine(),
+            analysis_cache=ResponseCache(
+                max_entries=int(os.environ.get("MINDCART_CACHE_SIZE", 256)),
+                ttl_seconds=ttl,
+                db_path=db_path
+            ),
+            item_cache=ResponseCache(
+                max_entries=int(os.environ.get("MINDCART_ITEM_CACHE_SIZE", 4096)),
+                ttl_seconds=ttl,
+                db_path=db_path,
+                table="item_cache"
+            ),
+            batcher=CartBatcher(
+                backend,
+                functools.partial(build_analysis_prompt, token_budget=token_budget),
+                window=float(os.environ.get("MINDCART_BATCH_WINDOW_MS", 50)) / 1000,
+                max_batch=int(os.environ.get("MINDCART_BATCH_SIZE", 8)),
+                max_workers=int(os.environ.get("MINDCART_GEMINI_CONCURRENCY", 8))
+            ),
+            verdict_model=load_verdict_model(),
+            verdict_log=VerdictLog(verdict_log_path) if verdict_log_path else None,
+            reason_cache=SimilarityCache(
+                threshold=float(os.environ.get("MINDCART_REASON_SIMILARITY", 0.7)),
+                max_entries=reason_cache_size
+            ) if reason_cache_size > 0 else None,
+            prompt_token_budget=token_budget
+        )
+
+    def analyze(self, cart_items, shopping_goal=None):
+        """Complete analysis of a cart"""
+        for event in self.stream(cart_items, shopping_goal):
+            if event[0] == "done":
+                return event[1]
+
+    def fallback(self, cart_items, shopping_goal=None):
+        return create_fallback_analysis(self.catalog, self.rule_engine, cart_items, shopping_goal,
+                                        self.verdict_model)
+
+    def stream(self, cart_items, shopping_goal=None):
+        """Analyze a cart, yielding verdicts as they stream in
+
+        Items the rule engine is confident about are decided locally, items
+        judged by the LLM in an earlier analysis come from the per-item
+        cache (or the reason cache, for the same item with a similarly
+        worded reason), and the distilled verdict model (if any) takes the
+        ones it is confident about; only the remaining items are sent to
+        the LLM, as many as fit the prompt's token budget. Rows beyond it
+        get the rules' verdict.
+        Yields ("item", index, item_analysis) for each cart item as soon as
+        its verdict is known, then ("done", analysis) with the complete
+        result. If the LLM call fails, ("warning", message) is yielded and
+        every item is yielded again from the fallback analysis.
+        """
+        started = time.perf_counter()
+        units = sum(item.get("quantity", 1) for item in cart_items)
+        metrics.CART_LINES.observe(len(cart_items))
+        metrics.CART_ITEMS.observe(units)
+
+        def finished(source, pending=0):
+            seconds = time.perf_counter() - started
+            metrics.ANALYSIS_SECONDS.observe(seconds, source=source)
+            metrics.log_event("analysis", source=source, lines=len(cart_items), units=units,
+                              llm_items=pending, seconds=round(seconds, 4))
+
+        def fall_back(reason, error=None):
+            metrics.FALLBACKS.inc(reason=reason)
+            metrics.log_event("analysis_fallback", logging.WARNING, reason=reason, error=error and str(error))
+            finished("fallback")
+            return replay_analysis(self.fallback(cart_items, shopping_goal))
+
+        catalog = self.catalog
+        engine = self.rule_engine
+        model_name = self.backend.model_name
+        cache_key = make_cache_key(cart_items, shopping_goal, model_name, self.prompt_version)
+        cached = self.analysis_cache.get(cache_key)
+        if cached is not None:
+            finished("cache")
+            yield from replay_analysis(cached)
+            return
+
+        # Fast path: decide clear-cut and previously judged items without the LLM
+        category_mix = {catalog[item["sku"]].category for item in cart_items}
+        item_keys = {}
+        reason_buckets = {}
+        known_items = {}
+        pending = []
+        for i, item in enumerate(cart_items):
+            product = catalog[item["sku"]]
+            rule = engine.evaluate(product.category, product.price, shopping_goal)
+            if engine.is_confident(rule):
+                known_items[i] = build_item_analysis(catalog, item, rule.verdict, rule.suggestion)
+                yield ("item", i, known_items[i])
+                continue
+
+            item_keys[i] = make_item_cache_key(item, shopping_goal, category_mix, model_name, self.prompt_version)
+            cached_item = self.item_cache.get(item_keys[i])
+            if cached_item is not None:
+                known_items[i] = build_item_analysis(catalog, item, cached_item["verdict"], cached_item["suggestion"])
+                yield ("item", i, known_items[i])
+                continue
+
+            if self.reason_cache is not None and item.get("reason"):
+                # Same item, goal and cart mix; only the reason's wording may differ
+                reason_buckets[i] = make_item_cache_key(
+                    {**item, "reason": ""}, shopping_goal, category_mix, model_name, self.prompt_version
+                )
+                similar = self.reason_cache.get(reason_buckets[i], item["reason"])
+                if similar is not None:
+                    known_items[i] = build_item_analysis(catalog, item, similar["verdict"], similar["suggestion"])
+                    yield ("item", i, known_items[i])
+                    continue
+
+            if self.verdict_model is not None:
+                verdict, suggestion, confidence = self.verdict_model.predict(product, item.get("reason"), shopping_goal)
+                if confidence >= self.verdict_model.confidence_threshold:
+                    metrics.MODEL_VERDICTS.inc(result="used")
+                    known_items[i] = build_item_analysis(catalog, item, verdict, suggestion or NEUTRAL_SUGGESTION)
+                    yield ("item", i, known_items[i])
+                    continue
+                metrics.MODEL_VERDICTS.inc(result="deferred")
+            pending.append(i)
+
+        # Lines repeating the same product and reason share one prompt row and verdict
+        groups = {}
+        first_index = {}
+        for i in pending:
+            item = cart_items[i]
+            first = first_index.setdefault((item["sku"], item.get("reason") or ""), i)
+            groups.setdefault(first, []).append(i)
+        cart_details = []
+        for first, members in groups.items():
+            item = cart_items[first]
+            product = catalog[item["sku"]]
+            cart_details.append({
+                "id": first,
+                "name": product.name,
+                "price": product.price,
+                "category": product.category,
+                "quantity": sum(cart_items[i].get("quantity", 1) for i in members),
+                "reason": item.get("reason") or "No reason provided"
+            })
+
+        # Rows beyond the prompt's token budget would only be totalled per
+        # category and never answered; the rules decide them instead
+        _, left_over = split_items_by_budget(cart_details, shopping_goal, self.prompt_token_budget)
+        for first in left_over:
+            metrics.PROMPT_OVERFLOW_ROWS.inc(kind="item")
+            for i in groups.pop(first):
+                verdict, suggestion = rule_verdict(engine, catalog[cart_items[i]["sku"]], shopping_goal)
+                known_items[i] = build_item_analysis(catalog, cart_items[i], verdict, suggestion)
+                yield ("item", i, known_items[i])
+        if left_over:
+            cart_details = [row for row in cart_details if row["id"] in groups]
+            pending = [i for i in pending if i not in known_items]
+
+        if not pending:
+            analysis = assemble_analysis(
+                catalog, cart_items, known_items,
+                summarize_cart(catalog, engine, cart_items, known_items, shopping_goal)
+            )
+            finished("local")
+            yield ("done", analysis)
+            return
+
+        if not self.backend.available:
+            # Don't queue behind an API that is known to be failing
+            yield from fall_back("circuit_open")
+            return
+
+        try:
+            # Only the items that need judgment go into the prompt
+            decided = [
+                {"name": analysis_item["name"], "price": analysis_item["price"],
+                 "category": catalog[analysis_item["sku"]].category,
+                 "quantity": analysis_item["quantity"], "verdict": analysis_item["verdict"]}
+                for analysis_item in known_items.values()
+            ]
+
+            # Call the LLM (batched with other requests) and use verdicts as they arrive
+            llm_items = {}
+            partial = set()  # answers salvaged from a cut-off response
+
+            payload = {"goal": shopping_goal, "items": cart_details, "decided": decided}
+            for record in self.batcher.submit(payload):
+                index = record.get("id")
+                if record.get("type") != "item" or index not in groups or index in llm_items:
+                    continue
+                for i in groups[index]:
+                    llm_items[i] = build_item_analysis(
+                        catalog, cart_items[i], record["verdict"], record["suggestion"]
+                    )
+                    if record.get("partial"):
+                        partial.add(i)
+                    yield ("item", i, llm_items[i])
+
+            # Partial answers are shown but never cached or used as training data
+            answers = {i: item_analysis for i, item_analysis in llm_items.items() if i not in partial}
+            for i, item_analysis in answers.items():
+                verdict = {"verdict": item_analysis["verdict"], "suggestion": item_analysis["suggestion"]}
+                self.item_cache.set(item_keys[i], verdict)
+                if i in reason_buckets:
+                    self.reason_cache.set(reason_buckets[i], cart_items[i]["reason"], verdict)
+            if self.verdict_log is not None:
+                # Training data for the distilled model; only real LLM answers
+                self.verdict_log.record([
+                    log_row(catalog[cart_items[i]["sku"]], cart_items[i], shopping_goal,
+                            item_analysis["verdict"], item_analysis["suggestion"],
+                            model_name, self.prompt_version)
+                    for i, item_analysis in answers.items()
+                ])
+
+            # Items the model skipped get a neutral verdict, and the result isn't cached
+            complete = len(answers) == len(pending)
+            for i in pending:
+                if i not in llm_items:
+                    llm_items[i] = build_item_analysis(catalog, cart_items[i], OPTIONAL, NEUTRAL_SUGGESTION)
+                    yield ("item", i, llm_items[i])
+
+            item_analyses = {**known_items, **llm_items}
+            analysis = assemble_analysis(
+                catalog, cart_items, item_analyses,
+                summarize_cart(catalog, engine, cart_items, item_analyses, shopping_goal)
+            )
+            if complete:
+                self.analysis_cache.set(cache_key, analysis)
+            finished("llm", len(groups))
+            yield ("done", analysis)
+
+        except CircuitOpenError:
+            yield from fall_back("circuit_open")
+
+        except Exception as e:
+            logger.warning("LLM analysis failed, using fallback: %s", e)
+            yield ("warning", f"Using fallback analysis (Gemini API not configured): {e}")
+            yield from fall_back("error", e)
@@ -0,0 +1,156 @@
+"""Cross-session micro-batching of analysis requests.
+
+Requests that arrive within a short window of each other are packed into a
+single prompt, one section per cart, and sent as one streamed Gemini call.
+Every response line carries the id of the cart it belongs to, so records are
+routed back to the waiting sessions as they arrive. A cart that the batched
+response doesn't fully answer is retried on its own.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mindcart import metrics
+from mindcart.schema import validate_record
+from mindcart.streaming import JSONRecordExtractor
+
+
+class _Request:
+    __slots__ = ("payload", "records", "finished")
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.records = queue.Queue()
+        self.finished = False
+
+
+class CartBatcher:
+    """Collects concurrent requests for ``window`` seconds and sends them together
+
+    ``prompt_builder`` receives a list of ``(cart_id, payload)`` pairs and
+    returns the prompt text. The response must be JSON Lines where each
+    record has a ``"cart"`` field, and each cart ends with a record of type
+    ``"end"``. Records are repaired and validated before they are routed.
+    """
+
+    def __init__(self, client, prompt_builder, window=0.05, max_batch=8, max_workers=8):
+        self.client = client
+        self.prompt_builder = prompt_builder
+        self.window = window
+        self.max_batch = max_batch
+        self.batches_sent = 0
+        self.requests_batched = 0
+        self._pending = []
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cart-batch")
+        self._collector = threading.Thread(target=self._collect, name="cart-batcher", daemon=True)
+        self._collector.start()
+
+    def submit(self, payload):
+        """Blocking generator over the response records for one cart"""
+        request = _Request(payload)
+        with self._condition:
+            self._pending.append(request)
+            self._condition.notify()
+
+        while True:
+            kind, value = request.records.get()
+            if kind == "record":
+                yield value
+            elif kind == "error":
+                raise value
+            else:
+                return
+
+    def _collect(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                # Hold the first request briefly so concurrent ones can join it
+                flush_at = time.monotonic() + self.window
+                while len(self._pending) < self.max_batch:
+                    remaining = flush_at - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+            self._executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        with self._condition:
+            self.batches_sent += 1
+            self.requests_batched += len(batch)
+        carts = {f"c{i}": request for i, request in enumerate(batch)}
+        answered = set()
+
+        metrics.BATCH_CARTS.observe(len(batch))
+        started = None
+        parse_seconds = 0.0
+        first_chunk = True
+        try:
+            with metrics.PROMPT_BUILD_SECONDS.time():
+                prompt = self.prompt_builder([(cart_id, r.payload) for cart_id, r in carts.items()])
+            metrics.PROMPT_CHARS.inc(len(prompt))
+            parser = JSONRecordExtractor(validate=validate_record)
+            started = time.perf_counter()
+            for chunk in self.client.stream(prompt):
+                if first_chunk:
+                    metrics.LLM_FIRST_CHUNK_SECONDS.observe(time.perf_counter() - started)
+                    first_chunk = False
+                metrics.RESPONSE_CHARS.inc(len(chunk))
+                parse_started = time.perf_counter()
+                records = parser.feed(chunk)
+                parse_seconds += time.perf_counter() - parse_started
+                self._route(records, carts, answered)
+            parse_started = time.perf_counter()
+            records = parser.close()
+            parse_seconds += time.perf_counter() - parse_started
+            self._route(records, carts, answered)
+        except Exception as e:
+            if started is not None:
+                metrics.LLM_SECONDS.observe(time.perf_counter() - started, outcome="error")
+            if len(batch) == 1:
+                self._finish(batch[0], ("error", e))
+                return
+        else:
+            metrics.LLM_SECONDS.observe(time.perf_counter() - started, outcome="ok")
+            metrics.PARSE_SECONDS.observe(parse_seconds)
+            metrics.RECORDS_DISCARDED.inc(parser.discarded)
+            if len(batch) == 1:
+                # A lone request has nothing to fall back to; the caller judges its records
+                self._finish(batch[0], ("end", None))
+                return
+
+        for cart_id, request in carts.items():
+            if cart_id in answered:
+                self._finish(request, ("end", None))
+            else:
+                # The batched response dropped or mangled this cart; give it its own call
+                self._executor.submit(self._dispatch, [request])
+
+    def _route(self, records, carts, answered):
+        single = next(iter(carts)) if len(carts) == 1 else None
+        for record in records:
+            cart_id = single or record.get("cart")
+            request = carts.get(cart_id)
+            if request is None:
+                continue
+            request.records.put(("record", record))
+            if record.get("type") == "end":
+                answered.add(cart_id)
+
+    @staticmethod
+    def _finish(request, message):
+        if not request.finished:
+            request.finished = True
+            request.records.put(message)
+
+    def stats(self):
+        return {
+            "batches_sent": self.batches_sent,
+            "requests_batched": self.requests_batched,
+            "avg_batch_size": self.requests_batched / self.batches_sent if self.batches_sent else 0.0,
+        }
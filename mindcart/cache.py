@@ -0,0 +1,160 @@
+"""Response cache for cart analyses.
+
+Entries live in a bounded in-memory LRU tier and, optionally, in an on-disk
+SQLite tier so results survive restarts and can be shared between worker
+processes. Both tiers expire entries after a TTL.
+"""
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from mindcart import metrics
+
+
+def make_cache_key(cart_items, shopping_goal, model_name, prompt_version):
+    """Canonical hash of everything that influences an analysis"""
+    items = sorted(
+        (item["sku"], item.get("quantity", 1), item.get("reason") or "") for item in cart_items
+    )
+    payload = json.dumps(
+        {
+            "items": items,
+            "goal": shopping_goal or "",
+            "model": model_name,
+            "prompt_version": prompt_version,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def make_item_cache_key(item, shopping_goal, category_mix, model_name, prompt_version):
+    """Hash for a single item's verdict
+
+    ``category_mix`` is the set of categories present in the cart rather than
+    their counts, so adding another item of a category already in the cart
+    keeps every other item's verdict cached.
+    """
+    payload = json.dumps(
+        {
+            "item": item["sku"],
+            "quantity": item.get("quantity", 1),
+            "reason": item.get("reason") or "",
+            "goal": shopping_goal or "",
+            "categories": sorted(category_mix),
+            "model": model_name,
+            "prompt_version": prompt_version,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with TTL expiry and an optional SQLite tier"""
+
+    def __init__(self, max_entries=256, ttl_seconds=3600, db_path=None, table="response_cache"):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name: {table!r}")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._table = table
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS {table}_expires_at ON {table} (expires_at)")
+            self._db.commit()
+
+    def get(self, key):
+        """Return a copy of the cached value, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    metrics.CACHE_REQUESTS.inc(cache=self._table, result="hit")
+                    return copy.deepcopy(value)
+                del self._entries[key]
+
+            row = self._db_get(key, now)
+            if row is not None:
+                # Keep the stored expiry; promoting a row doesn't extend its life
+                value, expires_at = row
+                self._remember(key, value, expires_at)
+                self.hits += 1
+                metrics.CACHE_REQUESTS.inc(cache=self._table, result="hit")
+                return copy.deepcopy(value)
+
+            self.misses += 1
+            metrics.CACHE_REQUESTS.inc(cache=self._table, result="miss")
+            return None
+
+    def set(self, key, value):
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._remember(key, value, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self._table} (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), expires_at),
+                )
+                # Rows that are never read again would otherwise stay forever
+                self._db.execute(f"DELETE FROM {self._table} WHERE expires_at <= ?", (now,))
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute(f"DELETE FROM {self._table}")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+    def _remember(self, key, value, expires_at):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _db_get(self, key, now):
+        """(value, expires_at) of a live SQLite row, or None"""
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            f"SELECT value, expires_at FROM {self._table} WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            self._db.execute(f"DELETE FROM {self._table} WHERE key = ?", (key,))
+            self._db.commit()
+            return None
+        return json.loads(row[0]), row[1]
@@ -0,0 +1,104 @@
+"""Shopping cart kept in session state.
+
+One line per SKU with a quantity, so adding the same product again bumps a
+counter instead of storing another copy. The total and per-category unit
+counts are updated on every change rather than recomputed on each render.
+"""
+from mindcart.catalog import CATEGORIES
+
+
+class LineItem:
+    __slots__ = ("sku", "name", "price", "category", "quantity", "reason")
+
+    def __init__(self, sku, name, price, category, quantity=1, reason=""):
+        self.sku = sku
+        self.name = name
+        self.price = price
+        self.category = category
+        self.quantity = quantity
+        self.reason = reason
+
+    @property
+    def subtotal(self):
+        return self.price * self.quantity
+
+    def to_dict(self):
+        return {
+            "sku": self.sku,
+            "name": self.name,
+            "price": self.price,
+            "quantity": self.quantity,
+            "reason": self.reason,
+        }
+
+
+class Cart:
+    """Line items keyed by SKU, in the order they were first added"""
+
+    __slots__ = ("_lines", "total", "item_count", "category_counts")
+
+    def __init__(self):
+        self._lines = {}
+        self.total = 0
+        self.item_count = 0
+        self.category_counts = dict.fromkeys(CATEGORIES, 0)
+
+    def __len__(self):
+        """Number of distinct products"""
+        return len(self._lines)
+
+    def __iter__(self):
+        return iter(self._lines.values())
+
+    def __contains__(self, sku):
+        return sku in self._lines
+
+    def __getitem__(self, sku):
+        return self._lines[sku]
+
+    def _adjust(self, line, quantity_change):
+        line.quantity += quantity_change
+        self.total += line.price * quantity_change
+        self.item_count += quantity_change
+        self.category_counts[line.category] = self.category_counts.get(line.category, 0) + quantity_change
+
+    def add(self, product, quantity=1, reason=""):
+        """Add units of a catalog product; a reason only fills in an empty one"""
+        line = self._lines.get(product.sku)
+        if line is None:
+            line = LineItem(product.sku, product.name, product.price, product.category, 0, reason)
+            self._lines[product.sku] = line
+        elif reason and not line.reason:
+            line.reason = reason
+        self._adjust(line, quantity)
+        return line
+
+    # Edits to a line that is already gone are ignored: one interaction can
+    # fire several widget callbacks, and an earlier one may remove the line
+
+    def set_quantity(self, sku, quantity):
+        """Change a line's quantity; zero or less removes it"""
+        if quantity <= 0:
+            self.remove(sku)
+        elif sku in self._lines:
+            line = self._lines[sku]
+            self._adjust(line, quantity - line.quantity)
+
+    def set_reason(self, sku, reason):
+        if sku in self._lines:
+            self._lines[sku].reason = reason
+
+    def remove(self, sku):
+        line = self._lines.pop(sku, None)
+        if line is not None:
+            self._adjust(line, -line.quantity)
+
+    def clear(self):
+        self._lines.clear()
+        self.total = 0
+        self.item_count = 0
+        self.category_counts = dict.fromkeys(CATEGORIES, 0)
+
+    def to_items(self):
+        """Lines as plain dicts, the format the analysis and history take"""
+        return [line.to_dict() for line in self._lines.values()]
@@ -0,0 +1,271 @@
+"""Product catalog with an in-memory search index.
+
+Products can be loaded from CSV, Parquet or SQLite (columns ``sku``,
+``name``, ``category``, ``price`` and optionally ``emoji``); categories
+must be one of ``CATEGORIES``. Names are indexed by character trigrams for
+substring and fuzzy search, so lookups of three or more characters touch
+only the matching products instead of scanning the whole catalog.
+"""
+import csv
+import functools
+import math
+import sqlite3
+from array import array
+from collections import Counter, defaultdict
+
+CATEGORIES = ("Essential", "Treat", "Luxury", "Impulse")
+
+# Queries with at least this many substring matches skip fuzzy matching
+FUZZY_FALLBACK_LIMIT = 50
+
+# The demo catalog the app ships with: (sku, name, category, price, emoji)
+SAMPLE_PRODUCTS = [
+    ("ESS-MILK", "🥛 Milk", "Essential", 60, "🥛"),
+    ("TRT-CHOCCAKE", "🍫 Chocolate Cake", "Treat", 350, "🍫"),
+    ("LUX-SMARTWATCH", "⌚ Smartwatch", "Luxury", 15000, "⌚"),
+    ("ESS-APPLES", "🍎 Apples", "Essential", 120, "🍎"),
+    ("TRT-PIZZA", "🍕 Pizza", "Treat", 450, "🍕"),
+    ("ESS-TSHIRT", "👕 T-Shirt", "Essential", 800, "👕"),
+    ("LUX-CONSOLE", "🎮 Gaming Console", "Luxury", 50000, "🎮"),
+    ("ESS-SHAMPOO", "🧴 Shampoo", "Essential", 250, "🧴"),
+    ("TRT-POPCORN", "🍿 Popcorn", "Treat", 100, "🍿"),
+    ("IMP-PHONECASE", "📱 Phone Case", "Impulse", 500, "📱"),
+    ("IMP-TEDDY", "🧸 Teddy Bear", "Impulse", 1200, "🧸"),
+    ("ESS-COFFEE", "☕ Coffee", "Essential", 150, "☕"),
+    ("IMP-LIPSTICK", "💄 Lipstick", "Impulse", 800, "💄"),
+    ("ESS-RUNSHOES", "🏃‍♀️ Running Shoes", "Essential", 3500, "🏃‍♀️"),
+    ("TRT-CUPCAKES", "🍰 Cupcakes", "Treat", 200, "🍰"),
+]
+
+
+class Product:
+    __slots__ = ("sku", "name", "category", "price", "emoji")
+
+    def __init__(self, sku, name, category, price, emoji=""):
+        self.sku = sku
+        self.name = name
+        self.category = category
+        self.price = price
+        self.emoji = emoji
+
+    def __repr__(self):
+        return f"Product({self.sku!r}, {self.name!r}, {self.category!r}, {self.price!r})"
+
+
+class Page:
+    """One page of catalog query results"""
+
+    __slots__ = ("items", "total", "page", "page_size")
+
+    def __init__(self, items, total, page, page_size):
+        self.items = items
+        self.total = total
+        self.page = page
+        self.page_size = page_size
+
+    @property
+    def page_count(self):
+        return max(1, math.ceil(self.total / self.page_size)) if self.page_size else 1
+
+
+def _normalize(text):
+    return " ".join(text.casefold().split())
+
+
+def _trigrams(text):
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Catalog:
+    """Immutable, indexed collection of products"""
+
+    def __init__(self, products):
+        self._products = list(products)
+        self._by_sku = {}
+        for product in self._products:
+            if product.sku in self._by_sku:
+                raise ValueError(f"Duplicate SKU in catalog: {product.sku!r}")
+            if product.category not in CATEGORIES:
+                raise ValueError(f"Unknown category for {product.sku!r}: {product.category!r} "
+                                 f"(expected one of {', '.join(CATEGORIES)})")
+            self._by_sku[product.sku] = product
+        self._build_index()
+        # Per-instance so each catalog's results die with it
+        self._search = functools.lru_cache(maxsize=256)(self._search_uncached)
+
+    # Loading
+
+    @classmethod
+    def from_records(cls, records):
+        """Build a catalog from dicts or (sku, name, category, price, emoji) tuples"""
+        products = []
+        for record in records:
+            if isinstance(record, dict):
+                price = float(record["price"])
+                products.append(Product(
+                    str(record["sku"]), record["name"], record["category"],
+                    int(price) if price.is_integer() else price,
+                    record.get("emoji") or "",
+                ))
+            else:
+                products.append(Product(*record))
+        return cls(products)
+
+    @classmethod
+    def sample(cls):
+        return cls.from_records(SAMPLE_PRODUCTS)
+
+    @classmethod
+    def from_csv(cls, path):
+        with open(path, newline="", encoding="utf-8") as f:
+            return cls.from_records(csv.DictReader(f))
+
+    @classmethod
+    def from_parquet(cls, path):
+        import pandas as pd
+
+        frame = pd.read_parquet(path)
+        return cls.from_records(frame.to_dict("records"))
+
+    @classmethod
+    def from_sqlite(cls, path, table="products"):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table!r}")
+        connection = sqlite3.connect(path)
+        connection.row_factory = sqlite3.Row
+        try:
+            rows = connection.execute(f"SELECT * FROM {table}").fetchall()
+            return cls.from_records(dict(row) for row in rows)
+        finally:
+            connection.close()
+
+    @classmethod
+    def load(cls, source=None):
+        """Load from a .csv, .parquet or .db/.sqlite path; no source means the sample catalog"""
+        if not source:
+            return cls.sample()
+        lowered = source.lower()
+        if lowered.endswith(".csv"):
+            return cls.from_csv(source)
+        if lowered.endswith((".parquet", ".pq")):
+            return cls.from_parquet(source)
+        if lowered.endswith((".db", ".sqlite", ".sqlite3")):
+            return cls.from_sqlite(source)
+        raise ValueError(f"Unsupported catalog format: {source}")
+
+    # Lookup
+
+    def __len__(self):
+        return len(self._products)
+
+    def __contains__(self, sku):
+        return sku in self._by_sku
+
+    def __getitem__(self, sku):
+        return self._by_sku[sku]
+
+    def get(self, sku, default=None):
+        return self._by_sku.get(sku, default)
+
+    def __iter__(self):
+        return iter(self._products)
+
+    # Search
+
+    def _build_index(self):
+        self._names = [_normalize(product.name) for product in self._products]
+        self._prices = array("d", (product.price for product in self._products))
+
+        postings = defaultdict(list)
+        by_category = defaultdict(list)
+        for product_id, name in enumerate(self._names):
+            for gram in _trigrams(name):
+                postings[gram].append(product_id)
+            by_category[self._products[product_id].category].append(product_id)
+
+        # Compact posting lists; ids are appended in order so they stay sorted
+        self._trigram_index = {gram: array("I", ids) for gram, ids in postings.items()}
+        self._by_category = {category: array("I", ids) for category, ids in by_category.items()}
+
+    def search(self, text, fuzzy=True, min_similarity=0.5):
+        """Ids of products whose name contains ``text``, best matches first
+
+        With ``fuzzy`` enabled and few exact matches, names sharing at least
+        ``min_similarity`` of the query's trigrams are appended after them.
+        """
+        return list(self._search(_normalize(text), fuzzy, min_similarity))
+
+    def _search_uncached(self, query, fuzzy, min_similarity):
+        if not query:
+            return tuple(range(len(self._products)))
+
+        # Too short for a trigram; scan the names
+        if len(query) < 3:
+            return tuple(product_id for product_id, name in enumerate(self._names) if query in name)
+
+        grams = _trigrams(query)
+        # Substring match: candidates must contain every inner trigram of the query
+        inner = [query[i:i + 3] for i in range(len(query) - 2)]
+        posting_lists = sorted((self._trigram_index.get(gram, ()) for gram in inner), key=len)
+        candidates = set(posting_lists[0]) if posting_lists else set()
+        for ids in posting_lists[1:]:
+            candidates.intersection_update(ids)
+            if not candidates:
+                break
+        exact = sorted(product_id for product_id in candidates if query in self._names[product_id])
+
+        # Fuzzy matching is a fallback for misspellings, not a ranking pass
+        if not fuzzy or len(exact) >= FUZZY_FALLBACK_LIMIT:
+            return tuple(exact)
+
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._trigram_index.get(gram, ()))
+        needed = math.ceil(len(grams) * min_similarity)
+        exact_set = set(exact)
+        close = sorted(
+            (product_id for product_id, count in shared.items()
+             if count >= needed and product_id not in exact_set),
+            key=lambda product_id: (-shared[product_id], product_id),
+        )
+        return tuple(exact + close)
+
+    def query(self, text="", categories=None, min_price=None, max_price=None,
+              page=0, page_size=24, fuzzy=True):
+        """Filtered, paginated search; ``page_size=None`` returns every match"""
+        if text and _normalize(text):
+            ids = self._search(_normalize(text), fuzzy, 0.5)
+            if categories:
+                ids = [i for i in ids if self._products[i].category in categories]
+        elif categories:
+            ids = sorted(i for category in categories for i in self._by_category.get(category, ()))
+        else:
+            ids = range(len(self._products))
+
+        if min_price is not None or max_price is not None:
+            low = -math.inf if min_price is None else min_price
+            high = math.inf if max_price is None else max_price
+            ids = [i for i in ids if low <= self._prices[i] <= high]
+
+        total = len(ids)
+        if page_size is None:
+            window = ids
+        else:
+            page = max(0, min(page, max(0, math.ceil(total / page_size) - 1)))
+            window = ids[page * page_size:(page + 1) * page_size]
+        return Page([self._products[i] for i in window], total, page, page_size)
+
+    def to_frame(self):
+        """Catalog as a pandas DataFrame indexed by SKU"""
+        import pandas as pd
+
+        return pd.DataFrame(
+            {
+                "sku": [p.sku for p in self._products],
+                "name": [p.name for p in self._products],
+                "category": [p.category for p in self._products],
+                "price": [p.price for p in self._products],
+                "emoji": [p.emoji for p in self._products],
+            }
+        ).set_index("sku")
@@ -0,0 +1,96 @@
+"""Memoized chart figures.
+
+Building a Plotly Express figure costs far more than rendering a built
+one, and the same charts are drawn on every rerun. ``FigureCache`` keeps
+finished figures keyed by builder and input data, and builds misses on a
+small bounded thread pool. Concurrent requests for the same chart wait on
+a single build instead of each doing the work.
+
+Builders take hashable arguments (tuples) so they can be used as keys.
+Cached figures are shared between sessions and must not be mutated.
+Plotly Express and pandas are imported on the first build, not at startup.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from mindcart import metrics
+
+CATEGORY_COLORS = {
+    "Essential": "#10b981",
+    "Treat": "#f59e0b",
+    "Luxury": "#ef4444",
+    "Impulse": "#8b5cf6"
+}
+
+
+def category_pie(categories):
+    """Pie chart of ``(category, count)`` pairs"""
+    import plotly.express as px
+
+    return px.pie(
+        values=[count for _, count in categories],
+        names=[name for name, _ in categories],
+        title="Your Shopping Categories",
+        color_discrete_map=CATEGORY_COLORS
+    )
+
+
+def savings_line(series):
+    """Line chart of ``(date, savings)`` pairs"""
+    import pandas as pd
+    import plotly.express as px
+
+    df = pd.DataFrame(list(series), columns=["date", "savings"])
+    return px.line(
+        df,
+        x='date',
+        y='savings',
+        title='Your Savings Over Time',
+        labels={'savings': 'Savings (₹)', 'date': 'Date'}
+    )
+
+
+class FigureCache:
+    """LRU cache of built figures with single-flight builds on a bounded pool"""
+
+    def __init__(self, max_entries=256, max_workers=2):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._figures = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="charts")
+
+    def get(self, builder, *args):
+        key = (builder.__qualname__, args)
+        with self._lock:
+            if key in self._figures:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                metrics.CACHE_REQUESTS.inc(cache="charts", result="hit")
+                return self._figures[key]
+            self.misses += 1
+            metrics.CACHE_REQUESTS.inc(cache="charts", result="miss")
+            future = self._building.get(key)
+            if future is None:
+                future = self._executor.submit(self._build, key, builder, args)
+                self._building[key] = future
+        return future.result()
+
+    def _build(self, key, builder, args):
+        try:
+            figure = builder(*args)
+            with self._lock:
+                self._figures[key] = figure
+                while len(self._figures) > self.max_entries:
+                    self._figures.popitem(last=False)
+            return figure
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._figures), "hits": self.hits, "misses": self.misses}
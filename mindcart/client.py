@@ -0,0 +1,77 @@
+"""Client for the analysis service in ``mindcart.service``.
+
+Exposes the same ``analyze``/``stream`` interface as ``Analyzer`` so the
+app can use either. Streamed events arrive as JSON Lines. If the service
+can't be reached, the client falls back to the local rule-based analysis,
+which only needs the catalog and rules.
+"""
+import json
+import logging
+import urllib.error
+import urllib.request
+
+from mindcart.analysis import create_fallback_analysis, replay_analysis
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisClient:
+    """Talks to a remote analysis service at ``base_url``"""
+
+    def __init__(self, base_url, catalog, rule_engine, timeout=60.0):
+        self.base_url = base_url.rstrip("/")
+        self.catalog = catalog
+        self.rule_engine = rule_engine
+        self.timeout = timeout
+
+    def _post(self, path, body):
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    @staticmethod
+    def _cart_body(cart_items, shopping_goal):
+        return {
+            "items": [
+                {"sku": item["sku"], "quantity": item.get("quantity", 1), "reason": item.get("reason", "")}
+                for item in cart_items
+            ],
+            "goal": shopping_goal,
+        }
+
+    def analyze(self, cart_items, shopping_goal=None):
+        for event in self.stream(cart_items, shopping_goal):
+            if event[0] == "done":
+                return event[1]
+
+    def analyze_batch(self, carts):
+        """Analyses for a list of (cart_items, shopping_goal) pairs, in order"""
+        body = {"carts": [self._cart_body(items, goal) for items, goal in carts]}
+        with self._post("/analyze/batch", body) as response:
+            return json.load(response)["results"]
+
+    def fallback(self, cart_items, shopping_goal=None):
+        return create_fallback_analysis(self.catalog, self.rule_engine, cart_items, shopping_goal)
+
+    def stream(self, cart_items, shopping_goal=None):
+        """Same events as ``Analyzer.stream``"""
+        try:
+            with self._post("/analyze/stream", self._cart_body(cart_items, shopping_goal)) as response:
+                for line in response:
+                    if line.strip():
+                        event = tuple(json.loads(line))
+                        yield event
+                        if event[0] == "done":
+                            return
+        except (OSError, ValueError) as e:
+            # OSError covers URLError and timeouts; ValueError a garbled stream
+            logger.warning("Analysis service failed, using fallback: %s", e)
+            yield ("warning", f"Using fallback analysis (analysis service unavailable): {e}")
+            yield from replay_analysis(self.fallback(cart_items, shopping_goal))
+            return
+        yield ("warning", "Using fallback analysis (analysis service ended the stream early)")
+        yield from replay_analysis(self.fallback(cart_items, shopping_goal))
@@ -0,0 +1,244 @@
+"""Local verdict model distilled from the LLM's own answers.
+
+With MINDCART_VERDICT_LOG set, every verdict the LLM returns is appended
+to a JSON Lines dataset (``VerdictLog``). ``train`` fits a logistic
+regression over TF-IDF features of the shopper's reason plus the item's
+category, the shopping goal and its log price, and exports the weights to
+a JSON file. ``VerdictModel`` scores that file with plain Python, so
+inference needs neither scikit-learn nor NumPy and takes microseconds.
+
+    python -m mindcart.distill train verdicts.jsonl -o verdict_model.json
+
+scikit-learn is only needed for training. Point MINDCART_VERDICT_MODEL at
+the exported file to have the analyzer use the model for items it is
+confident about (MINDCART_VERDICT_MODEL_CONFIDENCE, default 0.85); the
+rest still go to the LLM.
+"""
+import argparse
+import collections
+import json
+import math
+import re
+import sys
+import threading
+import time
+
+FORMAT_VERSION = 1
+_TOKEN = re.compile(r"(?u)\b\w\w+\b")
+
+
+def reason_terms(text):
+    """Lowercased words and word pairs of a reason; shared by training and inference"""
+    words = _TOKEN.findall((text or "").lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def _goal(shopping_goal):
+    return shopping_goal or "General Shopping"
+
+
+class VerdictLog:
+    """Appends the LLM's item verdicts to a JSON Lines dataset"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, rows):
+        if not rows:
+            return
+        lines = "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+def log_row(product, item, shopping_goal, verdict, suggestion, model_name, prompt_version):
+    return {
+        "ts": round(time.time(), 3),
+        "sku": product.sku,
+        "name": product.name,
+        "category": product.category,
+        "price": product.price,
+        "quantity": item.get("quantity", 1),
+        "reason": item.get("reason") or "",
+        "goal": _goal(shopping_goal),
+        "verdict": verdict,
+        "suggestion": suggestion,
+        "model": model_name,
+        "prompt_version": prompt_version,
+    }
+
+
+class VerdictModel:
+    """Exported logistic regression; ``predict`` returns (verdict, suggestion, confidence)"""
+
+    def __init__(self, spec, confidence_threshold=0.85):
+        if spec.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported verdict model format: {spec.get('format')!r}")
+        self.classes = spec["classes"]
+        self.intercept = spec["intercept"]
+        self.idf = spec["idf"]
+        self.weights = spec["weights"]
+        self.price_mean = spec["price_mean"]
+        self.price_std = spec["price_std"]
+        self.suggestions = spec["suggestions"]
+        self.confidence_threshold = confidence_threshold
+
+    @classmethod
+    def load(cls, path, confidence_threshold=0.85):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), confidence_threshold)
+
+    def probabilities(self, category, price, reason, shopping_goal=None):
+        logits = list(self.intercept)
+
+        def add(weights, value):
+            for k, weight in enumerate(weights):
+                logits[k] += weight * value
+
+        # TF-IDF of the reason, L2-normalized the way TfidfVectorizer does it
+        counts = collections.Counter(term for term in reason_terms(reason) if term in self.idf)
+        tfidf = {term: count * self.idf[term] for term, count in counts.items()}
+        norm = math.sqrt(sum(value * value for value in tfidf.values()))
+        for term, value in tfidf.items():
+            add(self.weights["r:" + term], value / norm)
+
+        for feature in ("c:" + category, "g:" + _goal(shopping_goal)):
+            if feature in self.weights:
+                add(self.weights[feature], 1.0)
+        add(self.weights["price"], (math.log1p(price) - self.price_mean) / self.price_std)
+
+        top = max(logits)
+        exps = [math.exp(logit - top) for logit in logits]
+        total = sum(exps)
+        return {verdict: e / total for verdict, e in zip(self.classes, exps)}
+
+    def predict(self, product, reason, shopping_goal=None):
+        probabilities = self.probabilities(product.category, product.price, reason, shopping_goal)
+        verdict = max(probabilities, key=probabilities.get)
+        suggestion = (
+            self.suggestions.get(f"{product.sku}|{verdict}")
+            or self.suggestions.get(f"{product.category}|{verdict}")
+            or self.suggestions.get(verdict)
+        )
+        return verdict, suggestion, probabilities[verdict]
+
+
+def load_rows(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _common_suggestions(rows):
+    """Most frequent suggestion per SKU, per category and overall, for each verdict"""
+    counters = collections.defaultdict(collections.Counter)
+    for row in rows:
+        if row.get("suggestion"):
+            for key in (f"{row['sku']}|{row['verdict']}", f"{row['category']}|{row['verdict']}", row["verdict"]):
+                counters[key][row["suggestion"]] += 1
+    return {key: counter.most_common(1)[0][0] for key, counter in counters.items()}
+
+
+def fit(rows, c=1.0):
+    """Train on logged rows and return the exportable model spec"""
+    try:
+        import numpy as np
+        from scipy import sparse
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+    except ImportError as e:
+        raise RuntimeError("Training needs scikit-learn: pip install scikit-learn") from e
+
+    verdicts = sorted({row["verdict"] for row in rows})
+    if len(verdicts) < 2:
+        raise ValueError("Training needs at least two different verdicts in the data")
+
+    vectorizer = TfidfVectorizer(analyzer=reason_terms)
+    text = vectorizer.fit_transform([row["reason"] for row in rows])
+    one_hot_names = sorted({"c:" + row["category"] for row in rows} | {"g:" + _goal(row["goal"]) for row in rows})
+    one_hot_index = {name: j for j, name in enumerate(one_hot_names)}
+    one_hot = sparse.lil_matrix((len(rows), len(one_hot_names)))
+    for i, row in enumerate(rows):
+        one_hot[i, one_hot_index["c:" + row["category"]]] = 1.0
+        one_hot[i, one_hot_index["g:" + _goal(row["goal"])]] = 1.0
+    log_price = np.log1p([float(row["price"]) for row in rows])
+    price_mean, price_std = float(log_price.mean()), float(log_price.std()) or 1.0
+    price = sparse.csr_matrix(((log_price - price_mean) / price_std).reshape(-1, 1))
+
+    features = sparse.hstack([text, one_hot, price]).tocsr()
+    classifier = LogisticRegression(C=c, max_iter=1000)
+    classifier.fit(features, [row["verdict"] for row in rows])
+
+    coef, intercept = classifier.coef_, classifier.intercept_
+    if len(classifier.classes_) == 2:
+        # A binary model has one weight vector; logits of -w/2 and w/2 give the same softmax
+        coef = np.vstack([-coef[0] / 2, coef[0] / 2])
+        intercept = np.array([-intercept[0] / 2, intercept[0] / 2])
+
+    names = ["r:" + term for term in vectorizer.get_feature_names_out()] + one_hot_names + ["price"]
+    return {
+        "format": FORMAT_VERSION,
+        "classes": [str(verdict) for verdict in classifier.classes_],
+        "intercept": [float(value) for value in intercept],
+        "idf": {term: float(value) for term, value in zip(vectorizer.get_feature_names_out(), vectorizer.idf_)},
+        "weights": {name: [round(float(value), 6) for value in coef[:, j]] for j, name in enumerate(names)},
+        "price_mean": price_mean,
+        "price_std": price_std,
+        "suggestions": _common_suggestions(rows),
+        "rows": len(rows),
+    }
+
+
+class _Product:
+    __slots__ = ("sku", "category", "price")
+
+    def __init__(self, row):
+        self.sku, self.category, self.price = row["sku"], row["category"], row["price"]
+
+
+def evaluate(spec, rows, confidence_threshold):
+    """(accuracy, coverage at the threshold, accuracy of the covered rows) on held-out rows"""
+    model = VerdictModel(spec, confidence_threshold)
+    correct = covered = covered_correct = 0
+    for row in rows:
+        verdict, _, confidence = model.predict(_Product(row), row["reason"], row["goal"])
+        hit = verdict == row["verdict"]
+        correct += hit
+        if confidence >= confidence_threshold:
+            covered += 1
+            covered_correct += hit
+    n = len(rows) or 1
+    return correct / n, covered / n, covered_correct / covered if covered else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m mindcart.distill", description="Distilled verdict model")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="fit a model on a verdict log and export it as JSON")
+    train.add_argument("data", help="JSON Lines written via MINDCART_VERDICT_LOG")
+    train.add_argument("-o", "--output", default="verdict_model.json")
+    train.add_argument("--holdout", type=float, default=0.2, help="share of rows kept back for evaluation")
+    train.add_argument("--confidence", type=float, default=0.85, help="threshold to report coverage at")
+    train.add_argument("-C", type=float, default=1.0, help="inverse regularization strength")
+    args = parser.parse_args(argv)
+
+    rows = load_rows(args.data)
+    # Every fifth row (for the default holdout) is held back, so the split is reproducible
+    step = round(1 / args.holdout) if args.holdout > 0 else 0
+    held_out = [row for i, row in enumerate(rows) if step and i % step == step - 1]
+    training = [row for i, row in enumerate(rows) if not (step and i % step == step - 1)]
+
+    if held_out:
+        accuracy, coverage, covered_accuracy = evaluate(fit(training, args.C), held_out, args.confidence)
+        print(f"held-out rows {len(held_out)}: accuracy {accuracy:.1%}; at confidence {args.confidence:.2f} "
+              f"the model decides {coverage:.1%} of items with accuracy {covered_accuracy:.1%}")
+
+    spec = fit(rows, args.C)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(spec, f, ensure_ascii=False)
+    print(f"trained on {len(rows)} rows ({', '.join(spec['classes'])}); wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
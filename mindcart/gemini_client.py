@@ -0,0 +1,243 @@
+"""Shared asynchronous Gemini client.
+
+A single client is meant to be created per process and reused by every
+Streamlit session. Requests run on a dedicated event loop thread through
+``generate_content_async`` so that the concurrency limit, retry policy and
+circuit breaker are enforced across all sessions at once.
+"""
+import asyncio
+import queue
+import random
+import threading
+import time
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+from mindcart import metrics
+from mindcart.llm import CircuitOpenError, LLMBackend
+
+# Errors worth retrying: rate limits, overloaded or flaky backends, timeouts
+TRANSIENT_ERRORS = (
+    asyncio.TimeoutError,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+)
+
+
+def record_usage(response):
+    """Add a response's reported prompt and output token counts to the metrics"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    metrics.LLM_TOKENS.inc(getattr(usage, "prompt_token_count", 0) or 0, kind="prompt")
+    metrics.LLM_TOKENS.inc(getattr(usage, "candidates_token_count", 0) or 0, kind="output")
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures and lets one probe through after a cool-down"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self._opened_at is not None and \
+                time.monotonic() - self._opened_at < self.reset_timeout
+
+    def allow_request(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._probing:
+                return False
+            # Half-open: let a single request test the API
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def record_abandoned(self):
+        """A request ended without an outcome (it was cancelled); free the probe slot"""
+        with self._lock:
+            self._probing = False
+
+
+class GeminiClient(LLMBackend):
+    """Process-wide Gemini client with deadlines, retries and a circuit breaker"""
+
+    def __init__(self, model_name, timeout=20.0, max_retries=3, base_delay=0.5,
+                 max_delay=8.0, max_concurrency=8, breaker=None):
+        self.model_name = model_name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self._model = genai.GenerativeModel(model_name)
+
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="gemini-client", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def available(self):
+        return not self.breaker.is_open
+
+    def generate(self, prompt, deadline=None):
+        """Blocking call that returns the response text
+
+        ``deadline`` bounds the whole call including retries; it defaults to
+        enough time for every attempt to hit its per-call timeout.
+        """
+        if deadline is None:
+            deadline = self.timeout * (self.max_retries + 1) + self.max_delay * self.max_retries
+        future = asyncio.run_coroutine_threadsafe(self.generate_async(prompt), self._loop)
+        try:
+            return future.result(timeout=deadline)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def stream(self, prompt, deadline=None):
+        """Blocking generator that yields response text chunks as they arrive
+
+        Failures before the first chunk are retried like ``generate``; once
+        text has been yielded an error is raised to the caller instead.
+        """
+        if deadline is None:
+            deadline = self.timeout * (self.max_retries + 1) + self.max_delay * self.max_retries
+        chunks = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(self._stream_into(prompt, chunks), self._loop)
+        give_up_at = time.monotonic() + deadline
+        try:
+            while True:
+                try:
+                    kind, value = chunks.get(timeout=max(give_up_at - time.monotonic(), 0))
+                except queue.Empty:
+                    raise TimeoutError("Gemini response exceeded its deadline") from None
+                if kind == "chunk":
+                    yield value
+                elif kind == "error":
+                    raise value
+                else:
+                    return
+        finally:
+            # Stop the request if the caller gave up or stopped reading
+            future.cancel()
+
+    async def _stream_into(self, prompt, chunks):
+        try:
+            if not self.breaker.allow_request():
+                raise CircuitOpenError("Gemini API is temporarily unavailable")
+            async with self._semaphore:
+                async for text in self._stream_with_retries(prompt):
+                    chunks.put(("chunk", text))
+        except asyncio.CancelledError:
+            self.breaker.record_abandoned()
+            raise
+        except Exception as e:
+            chunks.put(("error", e))
+        else:
+            chunks.put(("end", None))
+
+    async def _stream_with_retries(self, prompt):
+        attempt = 0
+        while True:
+            started = False
+            try:
+                response = await asyncio.wait_for(
+                    self._model.generate_content_async(
+                        prompt, stream=True, request_options={"timeout": self.timeout}
+                    ),
+                    self.timeout,
+                )
+                chunk_iter = response.__aiter__()
+                chunk = None
+                while True:
+                    try:
+                        # Each chunk gets its own deadline so a stalled stream fails fast
+                        chunk = await asyncio.wait_for(chunk_iter.__anext__(), self.timeout)
+                    except StopAsyncIteration:
+                        break
+                    started = True
+                    yield chunk.text
+                # The last chunk carries the usage totals for the whole call
+                record_usage(chunk)
+            except TRANSIENT_ERRORS:
+                if started or attempt >= self.max_retries:
+                    self.breaker.record_failure()
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            else:
+                self.breaker.record_success()
+                return
+
+    async def generate_async(self, prompt):
+        """Coroutine version of ``generate``; must run on the client's loop"""
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("Gemini API is temporarily unavailable")
+        try:
+            return await self._generate_with_retries(prompt)
+        except asyncio.CancelledError:
+            self.breaker.record_abandoned()
+            raise
+
+    async def _generate_with_retries(self, prompt):
+        async with self._semaphore:
+            attempt = 0
+            while True:
+                try:
+                    response = await asyncio.wait_for(
+                        self._model.generate_content_async(
+                            prompt, request_options={"timeout": self.timeout}
+                        ),
+                        self.timeout,
+                    )
+                    text = response.text
+                    record_usage(response)
+                except TRANSIENT_ERRORS:
+                    if attempt >= self.max_retries:
+                        self.breaker.record_failure()
+                        raise
+                    await asyncio.sleep(self._backoff(attempt))
+                    attempt += 1
+                except Exception:
+                    self.breaker.record_failure()
+                    raise
+                else:
+                    self.breaker.record_success()
+                    return text
+
+    def _backoff(self, attempt):
+        # Full jitter keeps sessions that failed together from retrying together
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
@@ -0,0 +1,240 @@
+"""Persistent shopping history.
+
+Confirmed orders are stored as sessions plus their line items. Each user's
+running totals are updated in the same transaction as the insert, so the
+history page reads one summary row and one page of sessions no matter how
+many sessions a user has accumulated.
+"""
+import abc
+import sqlite3
+import threading
+from datetime import datetime
+
+
+class HistoryStore(abc.ABC):
+    """Interface for history backends"""
+
+    @abc.abstractmethod
+    def record_session(self, user_id, items, savings, identity, created_at=None):
+        """Store a confirmed order; ``items`` are dicts with sku, name, price and optional quantity/verdict/reason"""
+
+    @abc.abstractmethod
+    def summary(self, user_id):
+        """Running totals for a user, or None if they have no sessions"""
+
+    @abc.abstractmethod
+    def sessions(self, user_id, page=0, page_size=10):
+        """One page of sessions, newest first"""
+
+    @abc.abstractmethod
+    def session_items(self, session_id):
+        """Line items of one stored session"""
+
+    @abc.abstractmethod
+    def savings_series(self, user_id, limit=100):
+        """(date, savings) pairs for the most recent sessions, oldest first"""
+
+
+def _order_totals(items):
+    """(units, total price) of an order's line items"""
+    units = sum(item.get("quantity", 1) for item in items)
+    total = sum(item["price"] * item.get("quantity", 1) for item in items)
+    return units, total
+
+
+def _summary_row(total_sessions, total_items, total_spent, total_savings,
+                 last_savings, previous_savings):
+    return {
+        "total_sessions": total_sessions,
+        "total_items": total_items,
+        "total_spent": total_spent,
+        "total_savings": total_savings,
+        "avg_items": total_items / total_sessions if total_sessions else 0.0,
+        "last_savings": last_savings,
+        "previous_savings": previous_savings,
+    }
+
+
+class SQLiteHistoryStore(HistoryStore):
+    """Default backend: a single SQLite file shared by every session in the process"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        item_count INTEGER NOT NULL,
+        total REAL NOT NULL,
+        savings REAL NOT NULL,
+        identity TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_sessions_user_date ON sessions (user_id, created_at);
+    CREATE TABLE IF NOT EXISTS session_items (
+        session_id INTEGER NOT NULL REFERENCES sessions (id),
+        sku TEXT NOT NULL,
+        name TEXT NOT NULL,
+        price REAL NOT NULL,
+        verdict TEXT,
+        reason TEXT,
+        quantity INTEGER NOT NULL DEFAULT 1
+    );
+    CREATE INDEX IF NOT EXISTS idx_session_items_session ON session_items (session_id);
+    CREATE TABLE IF NOT EXISTS user_stats (
+        user_id TEXT PRIMARY KEY,
+        total_sessions INTEGER NOT NULL,
+        total_items INTEGER NOT NULL,
+        total_spent REAL NOT NULL,
+        total_savings REAL NOT NULL,
+        last_savings REAL NOT NULL,
+        previous_savings REAL
+    );
+    """
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.executescript(self.SCHEMA)
+            # Databases created before quantities were tracked
+            columns = {row["name"] for row in self._db.execute("PRAGMA table_info(session_items)")}
+            if "quantity" not in columns:
+                self._db.execute("ALTER TABLE session_items ADD COLUMN quantity INTEGER NOT NULL DEFAULT 1")
+            self._db.commit()
+
+    def record_session(self, user_id, items, savings, identity, created_at=None):
+        created_at = created_at or datetime.now().strftime("%Y-%m-%d %H:%M")
+        units, total = _order_totals(items)
+        with self._lock, self._db:
+            session_id = self._db.execute(
+                "INSERT INTO sessions (user_id, created_at, item_count, total, savings, identity) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (user_id, created_at, units, total, savings, identity),
+            ).lastrowid
+            self._db.executemany(
+                "INSERT INTO session_items (session_id, sku, name, price, verdict, reason, quantity) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (session_id, item["sku"], item["name"], item["price"],
+                     item.get("verdict"), item.get("reason"), item.get("quantity", 1))
+                    for item in items
+                ],
+            )
+            self._db.execute(
+                "INSERT INTO user_stats (user_id, total_sessions, total_items, total_spent, "
+                "total_savings, last_savings, previous_savings) VALUES (?, 1, ?, ?, ?, ?, NULL) "
+                "ON CONFLICT (user_id) DO UPDATE SET "
+                "total_sessions = total_sessions + 1, "
+                "total_items = total_items + excluded.total_items, "
+                "total_spent = total_spent + excluded.total_spent, "
+                "total_savings = total_savings + excluded.total_savings, "
+                "previous_savings = last_savings, "
+                "last_savings = excluded.last_savings",
+                (user_id, units, total, savings, savings),
+            )
+        return session_id
+
+    def summary(self, user_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM user_stats WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return _summary_row(row["total_sessions"], row["total_items"], row["total_spent"],
+                            row["total_savings"], row["last_savings"], row["previous_savings"])
+
+    def sessions(self, user_id, page=0, page_size=10):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, created_at, item_count, total, savings, identity FROM sessions "
+                "WHERE user_id = ? ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+                (user_id, page_size, page * page_size),
+            ).fetchall()
+        return [
+            {"id": row["id"], "date": row["created_at"], "items": row["item_count"],
+             "total": row["total"], "savings": row["savings"], "identity": row["identity"]}
+            for row in rows
+        ]
+
+    def session_items(self, session_id):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT sku, name, price, quantity, verdict, reason FROM session_items WHERE session_id = ?",
+                (session_id,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def savings_series(self, user_id, limit=100):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT created_at, savings FROM sessions WHERE user_id = ? "
+                "ORDER BY created_at DESC, id DESC LIMIT ?",
+                (user_id, limit),
+            ).fetchall()
+        return [(row["created_at"], row["savings"]) for row in reversed(rows)]
+
+
+class MemoryHistoryStore(HistoryStore):
+    """Process-local backend for demos and tests; nothing survives a restart"""
+
+    def __init__(self):
+        self._sessions = {}
+        self._items = {}
+        self._stats = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def record_session(self, user_id, items, savings, identity, created_at=None):
+        created_at = created_at or datetime.now().strftime("%Y-%m-%d %H:%M")
+        units, total = _order_totals(items)
+        with self._lock:
+            session_id = self._next_id
+            self._next_id += 1
+            self._sessions.setdefault(user_id, []).append({
+                "id": session_id, "date": created_at, "items": units,
+                "total": total, "savings": savings, "identity": identity,
+            })
+            self._items[session_id] = [
+                {"sku": item["sku"], "name": item["name"], "price": item["price"],
+                 "quantity": item.get("quantity", 1), "verdict": item.get("verdict"),
+                 "reason": item.get("reason")}
+                for item in items
+            ]
+            stats = self._stats.get(user_id)
+            if stats is None:
+                self._stats[user_id] = [1, units, total, savings, savings, None]
+            else:
+                stats[0] += 1
+                stats[1] += units
+                stats[2] += total
+                stats[3] += savings
+                stats[5] = stats[4]
+                stats[4] = savings
+        return session_id
+
+    def summary(self, user_id):
+        with self._lock:
+            stats = self._stats.get(user_id)
+            return _summary_row(*stats) if stats else None
+
+    def sessions(self, user_id, page=0, page_size=10):
+        with self._lock:
+            sessions = self._sessions.get(user_id, [])
+            end = len(sessions) - page * page_size
+            return [dict(s) for s in reversed(sessions[max(0, end - page_size):max(0, end)])]
+
+    def session_items(self, session_id):
+        with self._lock:
+            return [dict(item) for item in self._items.get(session_id, [])]
+
+    def savings_series(self, user_id, limit=100):
+        with self._lock:
+            return [(s["date"], s["savings"]) for s in self._sessions.get(user_id, [])[-limit:]]
+
+
+def open_history_store(location):
+    """``memory`` for a process-local store, otherwise a SQLite database path"""
+    if location == "memory":
+        return MemoryHistoryStore()
+    return SQLiteHistoryStore(location)
@@ -0,0 +1,96 @@
+"""Whole-cart summary computed from the cart and its item verdicts.
+
+Savings, the shopping identity badge, the personality split and the reward
+message used to be generated by the LLM along with the verdicts. They
+follow from the categories, prices and verdicts alone, so they are worked
+out here instead: the LLM only writes per-item text, and the same cart
+always gets the same numbers.
+"""
+from mindcart.rules import RECONSIDER
+
+# Share of each unit's weight that counts as mindful, indulgent and emotional
+PERSONALITY_WEIGHTS = {
+    "Essential": (1.0, 0.0, 0.0),
+    "Treat": (0.2, 0.6, 0.2),
+    "Luxury": (0.1, 0.7, 0.2),
+    "Impulse": (0.0, 0.3, 0.7),
+}
+TRAITS = ("mindful", "indulgent", "emotional")
+DEFAULT_PERSONALITY = {"mindful": 70, "indulgent": 20, "emotional": 10}
+# A suggested treat costs at most this share of what removing flagged items saves
+TREAT_BUDGET_SHARE = 0.1
+
+
+def estimated_savings(catalog, engine, cart_items, item_analyses, shopping_goal=None):
+    """What removing the items flagged for reconsideration would save"""
+    total_savings = 0
+    for i, item in enumerate(cart_items):
+        if item_analyses[i]["verdict"] != RECONSIDER:
+            continue
+        product = catalog[item["sku"]]
+        rule = engine.evaluate(product.category, product.price, shopping_goal)
+        # A rule's rate only applies if the rule flagged the item itself; an item
+        # flagged over a Keep or Optional rule (by the LLM or the model) saves its full price
+        savings_rate = rule.savings_rate if rule is not None and rule.verdict == RECONSIDER else 1.0
+        total_savings += product.price * item.get("quantity", 1) * savings_rate
+    return total_savings
+
+
+def personality(catalog, cart_items):
+    """Mindful/indulgent/emotional percentages of the cart's units, summing to 100"""
+    totals = [0.0, 0.0, 0.0]
+    for item in cart_items:
+        weights = PERSONALITY_WEIGHTS.get(catalog[item["sku"]].category, (1 / 3, 1 / 3, 1 / 3))
+        for trait, weight in enumerate(weights):
+            totals[trait] += weight * item.get("quantity", 1)
+    units = sum(totals)
+    if not units:
+        return dict(DEFAULT_PERSONALITY)
+
+    # Largest remainder, so rounding never makes the split add up to 99 or 101
+    shares = [100 * total / units for total in totals]
+    percents = [int(share) for share in shares]
+    by_remainder = sorted(range(len(shares)), key=lambda trait: percents[trait] - shares[trait])
+    for trait in by_remainder[:100 - sum(percents)]:
+        percents[trait] += 1
+    return dict(zip(TRAITS, percents))
+
+
+def identity_badge(split, flagged_share):
+    if split["emotional"] >= 40:
+        return "Impulse Buyer"
+    if split["mindful"] >= 70 and flagged_share <= 0.1:
+        return "Mindful Shopper"
+    if split["indulgent"] >= 50:
+        return "Indulgent Shopper"
+    return "Balanced Shopper"
+
+
+def reward_recommendation(catalog, flagged_units, savings):
+    """Encouragement for dropping flagged items, with a small treat that fits the savings"""
+    if not flagged_units:
+        return "Your cart already matches your goal. Nice, mindful choices!"
+    message = (f"Great job reviewing your cart! Removing the {flagged_units} flagged "
+               f"item{'s' if flagged_units != 1 else ''} saves ₹{savings:.0f}.")
+    treats = catalog.query(categories=["Treat"], max_price=savings * TREAT_BUDGET_SHARE, page_size=None).items
+    if treats:
+        treat = min(treats, key=lambda product: product.price)
+        message += f" Treat yourself to {treat.name} (₹{treat.price}) instead."
+    return message
+
+
+def summarize_cart(catalog, engine, cart_items, item_analyses, shopping_goal=None):
+    """Summary fields of an analysis, given per-item verdicts keyed by cart index"""
+    savings = estimated_savings(catalog, engine, cart_items, item_analyses, shopping_goal)
+    units = sum(item.get("quantity", 1) for item in cart_items)
+    flagged_units = sum(
+        item.get("quantity", 1) for i, item in enumerate(cart_items)
+        if item_analyses[i]["verdict"] == RECONSIDER
+    )
+    split = personality(catalog, cart_items)
+    return {
+        "estimated_savings": savings,
+        "identity_badge": identity_badge(split, flagged_units / units if units else 0.0),
+        "reward_recommendation": reward_recommendation(catalog, flagged_units, savings),
+        "personality": split,
+    }
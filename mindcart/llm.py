@@ -0,0 +1,144 @@
+"""LLM backend interface and offline backends.
+
+The analysis pipeline only needs something that can stream text for a
+prompt. ``GeminiClient`` is the production backend; the backends here let
+the app, the benchmarks and the load tests run without an API key:
+
+- ``ReplayBackend`` answers from recorded responses (or synthesizes valid
+  ones) and can inject latency and errors.
+- ``RecordingBackend`` wraps a real backend and saves every exchange so it
+  can be replayed later.
+"""
+import abc
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the API while the circuit breaker is open"""
+
+
+class LLMBackend(abc.ABC):
+    """Interface for text-generation backends"""
+
+    model_name = "unknown"
+
+    @property
+    def available(self):
+        """False while the backend knows calls would fail (e.g. circuit open)"""
+        return True
+
+    @abc.abstractmethod
+    def stream(self, prompt):
+        """Yield response text chunks as they arrive"""
+
+    def generate(self, prompt):
+        return "".join(self.stream(prompt))
+
+
+def prompt_hash(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+_CART_SECTION = re.compile(r"^## cart (\S+)$", re.MULTILINE)
+_ITEM_ID = re.compile(r"^(\d+)\|", re.MULTILINE)
+_SYNTHETIC_VERDICTS = ["✅ Keep", "⚠️ Reconsider", "🤔 Optional"]
+
+
+def synthetic_response(prompt):
+    """A well-formed JSON Lines answer for every cart and item id in the prompt"""
+    sections = _CART_SECTION.split(prompt)
+    carts = list(zip(sections[1::2], sections[2::2]))
+    lines = []
+    for cart_id, body in carts:
+        body = re.split(r"^(?:decided|summarized):", body, flags=re.MULTILINE)[0]
+        for item_id in _ITEM_ID.findall(body):
+            lines.append(json.dumps({
+                "cart": cart_id, "type": "item", "id": int(item_id),
+                "verdict": _SYNTHETIC_VERDICTS[int(item_id) % 3],
+                "suggestion": "Think about whether this fits your goal today.",
+            }, ensure_ascii=False))
+        lines.append(json.dumps({"cart": cart_id, "type": "end"}))
+    return "\n".join(lines) + "\n"
+
+
+class ReplayBackend(LLMBackend):
+    """Offline backend that replays recorded responses
+
+    Prompts without a recording are answered by ``responder`` (synthetic by
+    default). ``latency`` seconds are spread across the chunks of each
+    response, and ``error_rate`` of calls raise one of ``errors`` instead.
+    """
+
+    def __init__(self, responses=None, responder=synthetic_response, latency=0.0,
+                 chunk_size=80, error_rate=0.0, errors=(TimeoutError,), seed=None,
+                 model_name="replay"):
+        self.responses = dict(responses or {})
+        self.responder = responder
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.error_rate = error_rate
+        self.errors = errors
+        self.model_name = model_name
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """Load a JSONL recording written by RecordingBackend"""
+        responses = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    responses[record["prompt_hash"]] = record["response"]
+        return cls(responses, **kwargs)
+
+    def stream(self, prompt):
+        with self._lock:
+            self.calls += 1
+            fail = self.error_rate and self._random.random() < self.error_rate
+            error = self._random.choice(self.errors) if fail else None
+        if error is not None:
+            raise error("Injected replay failure")
+
+        text = self.responses.get(prompt_hash(prompt))
+        if text is None:
+            if self.responder is None:
+                raise KeyError("No recorded response for prompt")
+            text = self.responder(prompt)
+
+        chunks = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)] or [""]
+        delay = self.latency / len(chunks)
+        for chunk in chunks:
+            if delay:
+                time.sleep(delay)
+            yield chunk
+
+
+class RecordingBackend(LLMBackend):
+    """Passes calls through to ``backend`` and appends each exchange to a JSONL file"""
+
+    def __init__(self, backend, path):
+        self.backend = backend
+        self.path = path
+        self.model_name = backend.model_name
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        return self.backend.available
+
+    def stream(self, prompt):
+        chunks = []
+        for chunk in self.backend.stream(prompt):
+            chunks.append(chunk)
+            yield chunk
+        record = {"prompt_hash": prompt_hash(prompt), "response": "".join(chunks)}
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
@@ -0,0 +1,271 @@
+"""Process-wide metrics and structured event logs.
+
+Counters, gauges and histograms are kept in memory and rendered in the Prometheus
+text format, either by the analysis service's ``/metrics`` route or by
+``serve`` (a small local HTTP endpoint for the Streamlit app, which can't
+add routes of its own). Set MINDCART_LOG_FORMAT=json to also write one
+JSON object per notable event (finished analyses, fallbacks, failures)
+to stderr.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+event_logger = logging.getLogger("mindcart.events")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIMILARITY_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 1.0)
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500, 1000, 10000)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def _label_text(self, key, extra=None):
+        pairs = list(zip(self.labels, key)) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        return [f"{self.name}{self._label_text(key)} {value}" for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=SECONDS_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts, then sum and count
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels):
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[-1] if series else 0
+
+    def _samples(self):
+        lines = []
+        for key, series in sorted(self._series.items()):
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{self._label_text(key, ('le', repr(float(bound))))} {count}")
+            lines.append(f"{self.name}_bucket{self._label_text(key, ('le', '+Inf'))} {series[-1]}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {series[-2]}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {series[-1]}")
+        return lines
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values = {}
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self):
+        return [f"{self.name}{self._label_text(key)} {value}" for key, value in sorted(self._values.items())]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._get_or_create(Counter, name, help_text, labels)
+
+    def histogram(self, name, help_text, labels=(), buckets=SECONDS_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, labels, buckets)
+
+    def gauge(self, name, help_text, labels=()):
+        return self._get_or_create(Gauge, name, help_text, labels)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+# Analysis pipeline
+ANALYSIS_SECONDS = REGISTRY.histogram(
+    "mindcart_analysis_seconds", "Time to a finished cart analysis, by how it was produced", ["source"])
+CART_ITEMS = REGISTRY.histogram(
+    "mindcart_cart_items", "Units per analyzed cart", buckets=SIZE_BUCKETS)
+CART_LINES = REGISTRY.histogram(
+    "mindcart_cart_lines", "Distinct products per analyzed cart", buckets=SIZE_BUCKETS)
+FALLBACKS = REGISTRY.counter(
+    "mindcart_fallbacks_total", "Analyses that fell back to the rule-based result", ["reason"])
+PROMPT_BUILD_SECONDS = REGISTRY.histogram(
+    "mindcart_prompt_build_seconds", "Time to build an LLM prompt")
+PROMPT_OVERFLOW_ROWS = REGISTRY.counter(
+    "mindcart_prompt_overflow_rows_total", "Cart rows summarized by category to fit the prompt token budget", ["kind"])
+PROMPT_CHARS = REGISTRY.counter(
+    "mindcart_llm_prompt_chars_total", "Characters sent to the LLM")
+RESPONSE_CHARS = REGISTRY.counter(
+    "mindcart_llm_response_chars_total", "Characters received from the LLM")
+LLM_TOKENS = REGISTRY.counter(
+    "mindcart_llm_tokens_total", "Tokens reported by the LLM API", ["kind"])
+LLM_SECONDS = REGISTRY.histogram(
+    "mindcart_llm_request_seconds", "Duration of streamed LLM calls", ["outcome"])
+LLM_FIRST_CHUNK_SECONDS = REGISTRY.histogram(
+    "mindcart_llm_first_chunk_seconds", "Time from sending a prompt to its first response chunk")
+PARSE_SECONDS = REGISTRY.histogram(
+    "mindcart_parse_seconds", "Time spent extracting and validating records per LLM call")
+RECORDS_DISCARDED = REGISTRY.counter(
+    "mindcart_records_discarded_total", "Response records dropped as unparseable or invalid")
+BATCH_CARTS = REGISTRY.histogram(
+    "mindcart_batch_carts", "Carts packed into one LLM call", buckets=SIZE_BUCKETS)
+MODEL_VERDICTS = REGISTRY.counter(
+    "mindcart_model_verdicts_total", "Items the distilled verdict model decided (used) or left to the LLM (deferred)", ["result"])
+PREFETCHES = REGISTRY.counter(
+    "mindcart_prefetch_total", "Speculative cart analyses by outcome", ["outcome"])
+
+# Caches
+CACHE_REQUESTS = REGISTRY.counter(
+    "mindcart_cache_requests_total", "Cache lookups", ["cache", "result"])
+REASON_SIMILARITY = REGISTRY.histogram(
+    "mindcart_reason_similarity", "Best cosine similarity found by reason cache lookups",
+    buckets=SIMILARITY_BUCKETS)
+REASON_SIMILARITY_THRESHOLD = REGISTRY.gauge(
+    "mindcart_reason_similarity_threshold", "Similarity a reason needs to reuse a cached verdict")
+
+# UI
+PAGE_RENDER_SECONDS = REGISTRY.histogram(
+    "mindcart_page_render_seconds", "Streamlit script run time per page", ["page"])
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    return REGISTRY.render()
+
+
+class _JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "event": record.getMessage(),
+            **getattr(record, "fields", {}),
+        }
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging():
+    """Write events as JSON lines to stderr when MINDCART_LOG_FORMAT=json"""
+    if os.environ.get("MINDCART_LOG_FORMAT") != "json" or event_logger.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(_JSONFormatter())
+    event_logger.addHandler(handler)
+    event_logger.setLevel(logging.INFO)
+    event_logger.propagate = False
+
+
+def log_event(event, level=logging.INFO, **fields):
+    event_logger.log(level, event, extra={"fields": fields})
+
+
+def serve(port, host="127.0.0.1"):
+    """Serve /metrics from a background thread; None if the port is taken"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        logger.warning("Metrics endpoint not started on %s:%s: %s", host, port, e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,141 @@
+"""Speculative analysis of carts that have stopped changing.
+
+Every cart edit reschedules a session's prefetch; once the cart has been
+left alone for ``idle_seconds``, it is analyzed on a worker thread. The
+events are recorded as they arrive, so when the shopper asks for the
+analysis the page can replay a finished run or follow one still in
+flight instead of starting from scratch. Editing the cart again cancels
+the stale timer or run.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+from mindcart import metrics
+
+
+def cart_key(cart_items, shopping_goal):
+    return (
+        shopping_goal or "",
+        tuple((item["sku"], item.get("quantity", 1), item.get("reason") or "") for item in cart_items),
+    )
+
+
+class _Job:
+    __slots__ = ("key", "timer", "events", "started", "finished", "cancelled", "condition")
+
+    def __init__(self, key):
+        self.key = key
+        self.timer = None
+        self.events = []
+        self.started = False
+        self.finished = False
+        self.cancelled = False
+        self.condition = threading.Condition()
+
+    def cancel(self):
+        with self.condition:
+            self.cancelled = True
+            self.condition.notify_all()
+        if self.timer is not None:
+            self.timer.cancel()
+
+    def follow(self):
+        """Recorded events, then new ones until the run ends"""
+        position = 0
+        while True:
+            with self.condition:
+                while position == len(self.events) and not (self.finished or self.cancelled):
+                    self.condition.wait()
+                events = self.events[position:]
+                ended = self.finished or self.cancelled
+            yield from events
+            position += len(events)
+            if ended and position == len(self.events):
+                return
+
+
+class Prefetcher:
+    """Per-session speculative analyses on a bounded worker pool"""
+
+    def __init__(self, analyzer, idle_seconds=1.5, max_workers=4, max_sessions=1024):
+        self.analyzer = analyzer
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+
+    def schedule(self, session_id, cart_items, shopping_goal):
+        """Note a cart edit; the cart is analyzed if it then stays unchanged"""
+        key = cart_key(cart_items, shopping_goal)
+        with self._lock:
+            job = self._jobs.pop(session_id, None)
+            if job is not None and job.key == key and not job.cancelled:
+                self._jobs[session_id] = job
+                return
+            if job is not None:
+                job.cancel()
+                metrics.PREFETCHES.inc(outcome="cancelled")
+            if not cart_items:
+                return
+            job = _Job(key)
+            items = [dict(item) for item in cart_items]
+            job.timer = threading.Timer(self.idle_seconds, self._start, (job, items, shopping_goal))
+            job.timer.daemon = True
+            self._jobs[session_id] = job
+            while len(self._jobs) > self.max_sessions:
+                _, oldest = self._jobs.popitem(last=False)
+                oldest.cancel()
+        job.timer.start()
+
+    def take(self, session_id, cart_items, shopping_goal):
+        """Events of the prefetched analysis of exactly this cart, or None
+
+        A finished run is replayed and one in flight is followed as it
+        streams; a prefetch that hasn't started running yet, including one
+        queued behind other sessions' prefetches, is dropped, since the
+        caller is about to analyze the cart itself.
+        """
+        with self._lock:
+            job = self._jobs.pop(session_id, None)
+        if job is None:
+            metrics.PREFETCHES.inc(outcome="miss")
+            return None
+        with job.condition:
+            usable = job.key == cart_key(cart_items, shopping_goal) and not job.cancelled and (
+                job.started or job.finished
+            )
+        if not usable:
+            job.cancel()
+            metrics.PREFETCHES.inc(outcome="miss")
+            return None
+        metrics.PREFETCHES.inc(outcome="hit")
+        return job.follow()
+
+    def _start(self, job, cart_items, shopping_goal):
+        if not job.cancelled:
+            self._executor.submit(self._run, job, cart_items, shopping_goal)
+
+    def _run(self, job, cart_items, shopping_goal):
+        with job.condition:
+            # Cancelled while queued: don't send a prompt nobody will read
+            if job.cancelled:
+                job.finished = True
+                job.condition.notify_all()
+                return
+            job.started = True
+        metrics.PREFETCHES.inc(outcome="started")
+        try:
+            with closing(self.analyzer.stream(cart_items, shopping_goal)) as events:
+                for event in events:
+                    with job.condition:
+                        if job.cancelled:
+                            return
+                        job.events.append(event)
+                        job.condition.notify_all()
+        finally:
+            with job.condition:
+                job.finished = True
+                job.condition.notify_all()
@@ -0,0 +1,111 @@
+"""Deterministic verdict rules for cart items.
+
+Rules match on product category, price band and shopping goal. The first
+matching rule wins, so more specific rules go first. Each rule carries a
+confidence score: verdicts at or above the engine's threshold are final,
+everything else is left for Gemini to judge.
+"""
+import json
+
+KEEP = "✅ Keep"
+RECONSIDER = "⚠️ Reconsider"
+OPTIONAL = "🤔 Optional"
+
+# Said about an item when nothing more specific is known
+NEUTRAL_SUGGESTION = "Consider if this purchase aligns with your goals."
+
+
+class Rule:
+    """A verdict for items matching a category, price band and shopping goal
+
+    ``None`` for any condition means "match anything". ``savings_rate`` is
+    the share of the price counted as savings if the item is dropped.
+    """
+
+    __slots__ = ("category", "goals", "min_price", "max_price",
+                 "verdict", "suggestion", "confidence", "savings_rate")
+
+    def __init__(self, verdict, suggestion, confidence, category=None, goals=None,
+                 min_price=None, max_price=None, savings_rate=0.0):
+        self.category = category
+        self.goals = frozenset(goals) if goals else None
+        self.min_price = min_price
+        self.max_price = max_price
+        self.verdict = verdict
+        self.suggestion = suggestion
+        self.confidence = confidence
+        self.savings_rate = savings_rate
+
+    def matches(self, category, price, shopping_goal):
+        if self.category is not None and category != self.category:
+            return False
+        if self.goals is not None and shopping_goal not in self.goals:
+            return False
+        if self.min_price is not None and price < self.min_price:
+            return False
+        if self.max_price is not None and price > self.max_price:
+            return False
+        return True
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+DEFAULT_RULES = [
+    # Essentials
+    Rule(KEEP, "This is an essential item for your daily needs.", 0.95,
+         category="Essential", max_price=5000),
+    Rule(KEEP, "This is an essential item, but a pricey one. Make sure it's the right pick.", 0.6,
+         category="Essential"),
+
+    # Treats
+    Rule(RECONSIDER, "This is a treat, and today is about essentials. Save it for another day.", 0.9,
+         category="Treat", goals=["Essentials Only"], savings_rate=1.0),
+    Rule(KEEP, "You planned to treat yourself - enjoy it!", 0.9,
+         category="Treat", goals=["Treat Yourself"], max_price=500),
+    Rule(OPTIONAL, "This is a treat - enjoy responsibly if it fits your budget.", 0.6,
+         category="Treat"),
+
+    # Luxury
+    Rule(RECONSIDER, "This is a luxury item and today is about essentials. Consider if it's truly necessary right now.", 0.95,
+         category="Luxury", goals=["Essentials Only"], savings_rate=1.0),
+    Rule(RECONSIDER, "This is a luxury item. Consider if it's truly necessary right now.", 0.6,
+         category="Luxury", savings_rate=0.3),
+
+    # Impulse
+    Rule(RECONSIDER, "This seems like an impulse purchase, and today is about essentials.", 0.95,
+         category="Impulse", goals=["Essentials Only"], savings_rate=1.0),
+    Rule(OPTIONAL, "Could make a nice gift - check it fits the person and your budget.", 0.5,
+         category="Impulse", goals=["Gift Shopping"], savings_rate=1.0),
+    Rule(RECONSIDER, "This seems like an impulse purchase. Take a moment to think.", 0.7,
+         category="Impulse", savings_rate=1.0),
+
+    # Anything else
+    Rule(OPTIONAL, NEUTRAL_SUGGESTION, 0.0),
+]
+
+
+class RuleEngine:
+    """Evaluates items against an ordered list of rules"""
+
+    def __init__(self, rules=None, confidence_threshold=0.8):
+        self.rules = list(DEFAULT_RULES if rules is None else rules)
+        self.confidence_threshold = confidence_threshold
+
+    @classmethod
+    def from_json(cls, path, confidence_threshold=0.8):
+        """Load rules from a JSON list of Rule keyword arguments"""
+        with open(path, encoding="utf-8") as f:
+            rules = [Rule.from_dict(data) for data in json.load(f)]
+        return cls(rules, confidence_threshold)
+
+    def evaluate(self, category, price, shopping_goal=None):
+        """Return the first matching rule (the catch-all rule matches everything)"""
+        for rule in self.rules:
+            if rule.matches(category, price, shopping_goal):
+                return rule
+        return None
+
+    def is_confident(self, rule):
+        return rule is not None and rule.confidence >= self.confidence_threshold
@@ -0,0 +1,113 @@
+"""Validation of the records Gemini returns.
+
+Each record type has a schema of field specs that is compiled once into a
+list of checker functions. Validating a record runs those checkers, coerces
+near-miss values (verdicts without their emoji, ids written as strings
+like "3" or "#3") and returns a cleaned copy, or None if a required field
+can't be recovered.
+"""
+import re
+
+from mindcart.rules import NEUTRAL_SUGGESTION
+
+VERDICTS = {
+    "keep": "✅ Keep",
+    "reconsider": "⚠️ Reconsider",
+    "optional": "🤔 Optional",
+}
+_VERDICT_SYNONYMS = {"remove": "reconsider", "skip": "reconsider", "maybe": "optional"}
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+class Invalid(ValueError):
+    pass
+
+
+def _verdict(value):
+    if not isinstance(value, str):
+        raise Invalid("verdict")
+    lowered = value.casefold()
+    for word, canonical in VERDICTS.items():
+        if word in lowered:
+            return canonical
+    for word, target in _VERDICT_SYNONYMS.items():
+        if word in lowered:
+            return VERDICTS[target]
+    raise Invalid(f"unknown verdict {value!r}")
+
+
+def _text(value):
+    if not isinstance(value, str) or not value.strip():
+        raise Invalid("text")
+    return value.strip()
+
+
+def _number(value):
+    if isinstance(value, bool):
+        raise Invalid("number")
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        match = _NUMBER.search(value.replace(",", ""))
+        if match:
+            number = float(match.group())
+            return int(number) if number.is_integer() else number
+    raise Invalid("number")
+
+
+def _index(value):
+    number = _number(value)
+    if number != int(number) or number < 0:
+        raise Invalid("index")
+    return int(number)
+
+
+# field: (coerce, required, default)
+SCHEMAS = {
+    "item": {
+        "id": (_index, True, None),
+        "verdict": (_verdict, True, None),
+        "suggestion": (_text, False, NEUTRAL_SUGGESTION),
+        "cart": (str, False, None),
+    },
+    "end": {
+        "cart": (str, False, None),
+    },
+}
+
+
+def compile_schema(fields):
+    """Turn a field spec dict into a list of checkers run in order"""
+    checkers = []
+    for name, (coerce, required, default) in fields.items():
+        def check(record, cleaned, name=name, coerce=coerce, required=required, default=default):
+            if record.get(name) is not None:
+                try:
+                    cleaned[name] = coerce(record[name])
+                    return
+                except (Invalid, KeyError, TypeError, ValueError):
+                    if required:
+                        raise Invalid(name)
+            elif required:
+                raise Invalid(name)
+            if default is not None:
+                cleaned[name] = default
+        checkers.append(check)
+    return checkers
+
+
+_COMPILED = {record_type: compile_schema(fields) for record_type, fields in SCHEMAS.items()}
+
+
+def validate_record(record):
+    """Cleaned copy of an analysis record, or None if it doesn't fit its schema"""
+    checkers = _COMPILED.get(record.get("type"))
+    if checkers is None:
+        return None
+    cleaned = {"type": record["type"]}
+    try:
+        for check in checkers:
+            check(record, cleaned)
+    except Invalid:
+        return None
+    return cleaned
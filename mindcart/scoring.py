@@ -0,0 +1,117 @@
+"""Vectorized rule scoring for many carts at once.
+
+The app scores one cart at a time, item by item. Reporting jobs that
+re-score historical carts in bulk use this module instead: items from any
+number of carts go in as one DataFrame, products are joined by position
+against the catalog, and each rule is applied to the whole column of items
+as a boolean mask. Rule order is honoured the same way ``RuleEngine``
+does it — an item takes the first rule that matches.
+"""
+import numpy as np
+import pandas as pd
+
+from mindcart.catalog import CATEGORIES
+from mindcart.rules import NEUTRAL_SUGGESTION, OPTIONAL, RECONSIDER
+
+
+def catalog_columns(catalog):
+    """(skus, categories, prices) of a catalog as pandas/NumPy columns"""
+    products = list(catalog)
+    skus = pd.Index([p.sku for p in products])
+    categories = pd.Categorical([p.category for p in products])
+    prices = np.array([p.price for p in products], dtype=float)
+    return skus, categories, prices
+
+
+def score_items(items, catalog, engine, columns=None):
+    """Rule verdicts for a DataFrame of cart items
+
+    ``items`` needs ``cart_id`` and ``sku`` columns and may have ``goal``,
+    ``quantity`` (default 1) and ``reason``. Returns a copy with
+    ``quantity``, ``category``, ``price``,
+    ``verdict``, ``suggestion``, ``confidence``, ``confident``, ``flagged``
+    and ``savings`` added. ``columns`` is the output of ``catalog_columns``;
+    pass it when scoring many chunks against the same catalog.
+    """
+    skus, categories, prices = columns or catalog_columns(catalog)
+    positions = skus.get_indexer(items["sku"])
+    if (positions < 0).any():
+        missing = items["sku"][positions < 0].unique()[:5].tolist()
+        raise KeyError(f"SKUs not in catalog: {missing}")
+
+    category_codes = categories.codes[positions]
+    price = prices[positions]
+    quantity = items["quantity"].to_numpy() if "quantity" in items else np.ones(len(items), dtype=np.int64)
+    goal = items["goal"] if "goal" in items else pd.Series(None, index=items.index, dtype=object)
+    goal = pd.Categorical(goal)
+
+    # Index of the first matching rule per item; -1 where nothing matched
+    rules = engine.rules
+    rule_index = np.full(len(items), -1, dtype=np.int64)
+    for k, rule in enumerate(rules):
+        mask = rule_index == -1
+        if rule.category is not None:
+            if rule.category not in categories.categories:
+                continue
+            mask &= category_codes == categories.categories.get_loc(rule.category)
+        if rule.goals is not None:
+            codes = [goal.categories.get_loc(g) for g in rule.goals if g in goal.categories]
+            mask &= np.isin(goal.codes, codes)
+        if rule.min_price is not None:
+            mask &= price >= rule.min_price
+        if rule.max_price is not None:
+            mask &= price <= rule.max_price
+        rule_index[mask] = k
+
+    # Per-rule attributes with a trailing slot for "no rule matched"
+    rule_index[rule_index == -1] = len(rules)
+    verdict_labels = list(dict.fromkeys([rule.verdict for rule in rules] + [OPTIONAL]))
+    verdict_codes = np.array([verdict_labels.index(rule.verdict) for rule in rules]
+                             + [verdict_labels.index(OPTIONAL)])
+    suggestions = np.array([rule.suggestion for rule in rules] + [NEUTRAL_SUGGESTION], dtype=object)
+    confidence = np.array([rule.confidence for rule in rules] + [0.0])[rule_index]
+    savings_rate = np.array([rule.savings_rate for rule in rules] + [1.0])[rule_index]
+    is_reconsider = np.array([rule.verdict == RECONSIDER for rule in rules] + [False])[rule_index]
+
+    scored = items.copy()
+    scored["quantity"] = quantity
+    scored["category"] = pd.Categorical.from_codes(category_codes, categories.categories)
+    scored["price"] = price
+    scored["verdict"] = pd.Categorical.from_codes(verdict_codes[rule_index], verdict_labels)
+    scored["suggestion"] = suggestions[rule_index]
+    scored["confidence"] = confidence
+    scored["confident"] = confidence >= engine.confidence_threshold
+    scored["flagged"] = is_reconsider
+    scored["savings"] = np.where(is_reconsider, price * quantity * savings_rate, 0.0)
+    return scored
+
+
+def summarize_carts(scored):
+    """Per-cart totals from the output of ``score_items``, indexed by cart_id
+
+    Columns: ``total_items``, ``total_spent``, ``flagged_items``,
+    ``estimated_savings`` and one unit count per category; items are
+    weighted by quantity.
+    """
+    cart_codes, cart_ids = pd.factorize(scored["cart_id"])
+    n = len(cart_ids)
+    quantity = scored["quantity"].to_numpy()
+    summary = pd.DataFrame({
+        "total_items": np.bincount(cart_codes, weights=quantity, minlength=n).astype(np.int64),
+        "total_spent": np.bincount(cart_codes, weights=scored["price"] * quantity, minlength=n),
+        "flagged_items": np.bincount(cart_codes, weights=scored["flagged"] * quantity, minlength=n).astype(np.int64),
+        "estimated_savings": np.bincount(cart_codes, weights=scored["savings"], minlength=n),
+    }, index=pd.Index(cart_ids, name="cart_id"))
+
+    category_codes = pd.Categorical(scored["category"], categories=CATEGORIES).codes
+    for code, category in enumerate(CATEGORIES):
+        in_category = category_codes == code
+        summary[category] = np.bincount(
+            cart_codes[in_category], weights=quantity[in_category], minlength=n
+        ).astype(np.int64)
+    return summary
+
+
+def score_carts(items, catalog, engine):
+    """Per-cart scores for a DataFrame of items from many carts; see ``score_items``"""
+    return summarize_carts(score_items(items, catalog, engine))
@@ -0,0 +1,98 @@
+"""HTTP API for cart analysis, so it can scale apart from the UI servers.
+
+    uvicorn mindcart.service:app --workers 4
+
+Configured with the same MINDCART_* environment variables as the app, plus
+GEMINI_API_KEY. Endpoints:
+
+    POST /analyze         {"items": [{"sku", "quantity", "reason"}], "goal"} -> analysis
+    POST /analyze/batch   {"carts": [<cart>, ...]} -> {"results": [analysis, ...]}
+    POST /analyze/stream  <cart> -> JSON Lines of ["item", index, item] ... ["done", analysis]
+    GET  /health
+    GET  /metrics         Prometheus text format; MINDCART_LOG_FORMAT=json adds JSON event logs
+"""
+import asyncio
+import functools
+import json
+
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from mindcart import metrics
+from mindcart.analysis import Analyzer
+
+MAX_BATCH_CARTS = 64
+
+
+class CartItem(BaseModel):
+    sku: str
+    quantity: int = Field(1, ge=1)
+    reason: str = ""
+
+
+class Cart(BaseModel):
+    items: list[CartItem] = Field(min_length=1)
+    goal: str | None = None
+
+
+class CartBatch(BaseModel):
+    carts: list[Cart] = Field(min_length=1, max_length=MAX_BATCH_CARTS)
+
+
+@functools.lru_cache(maxsize=None)
+def get_analyzer():
+    """Process-wide analyzer so caches, batching and rate limits span all requests"""
+    return Analyzer.from_env()
+
+
+def _cart_items(cart, analyzer):
+    unknown = [item.sku for item in cart.items if item.sku not in analyzer.catalog]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown SKUs: {unknown}")
+    skus = [item.sku for item in cart.items]
+    if len(set(skus)) != len(skus):
+        raise HTTPException(status_code=422, detail="Each SKU may appear once; use quantity")
+    return [item.model_dump() for item in cart.items]
+
+
+metrics.configure_logging()
+app = FastAPI(title="MindCart analysis")
+
+
+@app.get("/health")
+async def health(analyzer=Depends(get_analyzer)):
+    return {"status": "ok", "llm_available": analyzer.backend.available}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_text():
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.post("/analyze")
+async def analyze(cart: Cart, analyzer=Depends(get_analyzer)):
+    items = _cart_items(cart, analyzer)
+    return await run_in_threadpool(analyzer.analyze, items, cart.goal)
+
+
+@app.post("/analyze/batch")
+async def analyze_batch(batch: CartBatch, analyzer=Depends(get_analyzer)):
+    carts = [(_cart_items(cart, analyzer), cart.goal) for cart in batch.carts]
+    # Submitted together, so the batcher packs them into shared LLM calls
+    results = await asyncio.gather(
+        *(run_in_threadpool(analyzer.analyze, items, goal) for items, goal in carts)
+    )
+    return {"results": results}
+
+
+@app.post("/analyze/stream")
+async def analyze_stream(cart: Cart, analyzer=Depends(get_analyzer)):
+    items = _cart_items(cart, analyzer)
+
+    async def lines():
+        async for event in iterate_in_threadpool(analyzer.stream(items, cart.goal)):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
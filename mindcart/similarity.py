@@ -0,0 +1,159 @@
+"""Approximate cache for verdicts keyed by free-text reasons.
+
+Shoppers word the same reason many ways ("for work", "need it for work",
+"work use"), so exact item keys rarely hit for carts with reasons. Here a
+reason is normalized (lowercased, stop words dropped) and hashed into a
+fixed-size vector of word and character-trigram counts. A lookup compares
+it by cosine similarity with the reasons stored under the same bucket, the
+item's cache key without its reason, and returns the nearest entry's value
+if it clears ``threshold``. Negations are matched exactly rather than by
+similarity, so "not for work" never reuses the verdict for "for work".
+Entries are evicted least recently used.
+
+NumPy is imported when the first cache is created, not at startup.
+"""
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+from mindcart import metrics
+
+STOP_WORDS = frozenset(
+    "a an the it its i im me my we our you your for to of on in at by with is was be am are "
+    "this that these those just so some and or really need needed want wanted do does did".split()
+)
+NEGATIONS = frozenset(
+    "not no never nothing none nor neither without cannot dont doesnt didnt isnt wasnt wont cant".split()
+)
+_WORD = re.compile(r"\w+")
+# "don't" -> "do not"; "can't" and "won't" leave "ca" and "wo", which only add noise
+_CONTRACTION = re.compile(r"n['’]t\b")
+
+
+def reason_words(text):
+    """Lowercased content words of a reason, and its negations as a sorted tuple"""
+    words = []
+    negations = set()
+    for word in _WORD.findall(_CONTRACTION.sub(" not", (text or "").lower())):
+        if word in NEGATIONS:
+            negations.add(word)
+        elif word not in STOP_WORDS:
+            words.append(word)
+    return words, tuple(sorted(negations))
+
+
+class SimilarityCache:
+    """LRU of (bucket, reason) -> value with nearest-neighbour lookup by cosine similarity"""
+
+    def __init__(self, threshold=0.7, max_entries=4096, dim=1024):
+        import numpy as np
+
+        self._np = np
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.dim = dim
+        self.hits = 0
+        self.misses = 0
+        # Rows are allocated as the cache fills, doubling up to max_entries
+        self._vectors = np.zeros((min(256, max_entries), dim), dtype=np.float32)
+        self._entries = OrderedDict()  # slot -> (bucket, value), least recently used first
+        self._buckets = {}  # bucket -> {reason words: slot}
+        self._free = list(range(len(self._vectors) - 1, -1, -1))
+        self._lock = threading.Lock()
+        metrics.REASON_SIMILARITY_THRESHOLD.set(threshold)
+
+    def vectorize(self, words):
+        """L2-normalized hashed counts; words count double next to their character trigrams"""
+        vector = self._np.zeros(self.dim, dtype=self._np.float32)
+        features = [f"w:{word}" for word in words] * 2
+        for word in words:
+            padded = f" {word} "
+            features.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+        for feature in features:
+            # crc32 rather than hash(), which differs between processes
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norm = self._np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def get(self, bucket, reason):
+        """Copy of the value stored for the most similar reason in ``bucket``, or None"""
+        words, negations = reason_words(reason)
+        bucket = (bucket, negations)
+        vector = self.vectorize(words) if words else None
+        with self._lock:
+            slots_by_reason = self._buckets.get(bucket)
+            slot = None
+            if slots_by_reason and vector is not None:
+                slot = slots_by_reason.get(" ".join(words))
+                if slot is None:
+                    slots = list(slots_by_reason.values())
+                    similarities = self._vectors[slots] @ vector
+                    best = int(similarities.argmax())
+                    metrics.REASON_SIMILARITY.observe(float(similarities[best]))
+                    if similarities[best] >= self.threshold:
+                        slot = slots[best]
+            if slot is None:
+                self.misses += 1
+                metrics.CACHE_REQUESTS.inc(cache="reason_similarity", result="miss")
+                return None
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            metrics.CACHE_REQUESTS.inc(cache="reason_similarity", result="hit")
+            return dict(self._entries[slot][1])
+
+    def set(self, bucket, reason, value):
+        words, negations = reason_words(reason)
+        bucket = (bucket, negations)
+        if not words:
+            return
+        vector = self.vectorize(words)
+        if vector is None:
+            return
+        key = " ".join(words)
+        with self._lock:
+            slot = self._buckets.get(bucket, {}).get(key)
+            if slot is None:
+                if not self._free:
+                    self._grow_or_evict()
+                slot = self._free.pop()
+                self._buckets.setdefault(bucket, {})[key] = slot
+            self._vectors[slot] = vector
+            self._entries[slot] = (bucket, dict(value))
+            self._entries.move_to_end(slot)
+
+    def _grow_or_evict(self):
+        capacity = len(self._vectors)
+        if capacity < self.max_entries:
+            grown = self._np.zeros((min(capacity * 2, self.max_entries), self.dim), dtype=self._np.float32)
+            grown[:capacity] = self._vectors
+            self._vectors = grown
+            self._free.extend(range(len(grown) - 1, capacity - 1, -1))
+            return
+        slot, (bucket, _) = self._entries.popitem(last=False)
+        slots_by_reason = self._buckets[bucket]
+        for key, candidate in slots_by_reason.items():
+            if candidate == slot:
+                del slots_by_reason[key]
+                break
+        if not slots_by_reason:
+            del self._buckets[bucket]
+        self._free.append(slot)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self._free = list(range(len(self._vectors) - 1, -1, -1))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "threshold": self.threshold,
+            }
@@ -0,0 +1,186 @@
+"""Incremental, tolerant parsing of streamed model output.
+
+Models don't always follow formatting instructions: they wrap output in
+markdown fences, pretty-print objects over several lines, return one big
+JSON document instead of JSON Lines, or leave out a comma. The extractor
+here scans the raw text for balanced JSON objects as chunks arrive, repairs
+common defects before decoding, and flattens whole-document answers into
+per-item records so that every well-formed verdict can be used.
+"""
+import json
+import re
+
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"'})
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+# A value followed by a new key without a comma, e.g. `"savings": 500 "badge": ...`
+_MISSING_COMMA = re.compile(r'("|\d|true|false|null|[}\]])(\s+)(?="[^"\n]*"\s*:)')
+_PYTHON_LITERALS = re.compile(r":\s*(True|False|None)\b")
+_PYTHON_TO_JSON = {"True": "true", "False": "false", "None": "null"}
+
+
+def repair_json(text):
+    """Fix the defects models commonly produce; valid JSON passes through unchanged"""
+    text = text.translate(_SMART_QUOTES)
+    text = _TRAILING_COMMA.sub(r"\1", text)
+    text = _MISSING_COMMA.sub(r"\1,\2", text)
+    text = _PYTHON_LITERALS.sub(lambda m: ": " + _PYTHON_TO_JSON[m.group(1)], text)
+    return close_brackets(text)
+
+
+def close_brackets(text):
+    """Append whatever closing quotes and brackets a truncated document is missing"""
+    stack = []
+    in_string = escape = False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+    return text + ('"' if in_string else "") + "".join(reversed(stack))
+
+
+def decode_object(text):
+    """Decode one JSON value, repairing it if needed; None if it can't be salvaged"""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(repair_json(text))
+    except json.JSONDecodeError:
+        return None
+
+
+def flatten_records(value):
+    """Turn a decoded value into analysis records
+
+    JSON Lines records (objects with a ``type``) pass through. A whole-cart
+    document with an ``items`` list is split into one record per item plus
+    an end record. Item ids are cart indices and rule-decided items aren't
+    listed, so an item's position says nothing about which line it answers;
+    items without an ``id`` fail validation and are dropped.
+    """
+    if isinstance(value, list):
+        return [record for element in value for record in flatten_records(element)]
+    if not isinstance(value, dict):
+        return []
+    if "type" in value:
+        return [value]
+
+    records = []
+    cart = value.get("cart")
+    items = value.get("items")
+    if isinstance(items, list):
+        for item in items:
+            if isinstance(item, dict):
+                record = {"type": "item", **item}
+                if cart is not None:
+                    record.setdefault("cart", cart)
+                records.append(record)
+        records.append({"type": "end"} if cart is None else {"type": "end", "cart": cart})
+    return records
+
+
+class JSONRecordExtractor:
+    """Pull JSON objects out of text that arrives in arbitrary chunks
+
+    Objects are found by bracket balancing rather than by line, so they may
+    span chunks and lines and be surrounded by prose or fences. Anything
+    that still fails to decode after repair is retried line by line, which
+    salvages the intact records from a JSON Lines answer with one bad line.
+    ``validate`` maps each record to its cleaned form, or None to drop it.
+    """
+
+    def __init__(self, validate=None):
+        self.validate = validate
+        self.discarded = 0
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text):
+        """Add a chunk and return the records completed by it"""
+        records = []
+        for ch in text:
+            if self._depth == 0:
+                if ch == "{" or ch == "[":
+                    self._buffer = [ch]
+                    self._depth = 1
+                continue
+
+            self._buffer.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"' or ch == "\n":
+                    # JSON strings can't contain raw newlines; assume a lost quote
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    records.extend(self._decode("".join(self._buffer)))
+                    self._buffer = []
+        return records
+
+    def close(self):
+        """Salvage whatever is left once the stream has ended
+
+        The text was cut off mid-object, so the records recovered from it
+        are marked ``partial``: a truncated suggestion is still worth
+        showing, but not worth keeping.
+        """
+        if self._depth == 0:
+            return []
+        text = "".join(self._buffer)
+        self._buffer = []
+        self._depth = 0
+        self._in_string = self._escape = False
+        records = self._decode(text)
+        for record in records:
+            record["partial"] = True
+        return records
+
+    def _decode(self, text):
+        value = decode_object(text)
+        if value is not None:
+            return self._clean(flatten_records(value))
+
+        # Usually several JSON Lines records glued together by one broken line
+        records = []
+        for line in text.splitlines():
+            line = line.strip().rstrip(",")
+            if line.startswith("{"):
+                value = decode_object(line)
+                if value is not None:
+                    records.extend(flatten_records(value))
+                else:
+                    self.discarded += 1
+        return self._clean(records)
+
+    def _clean(self, records):
+        if self.validate is None:
+            return records
+        cleaned = []
+        for record in records:
+            record = self.validate(record)
+            if record is None:
+                self.discarded += 1
+            else:
+                cleaned.append(record)
+        return cleaned